@@ -1,20 +1,40 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from fastapi import HTTPException, Security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+import asyncio
 import os
+import threading
 
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 24 * 30  # 30 days
+# Event stream tokens travel in the URL (EventSource cannot send headers) and so end up in
+# access logs; they are short-lived and only accepted by the events stream
+STREAM_TOKEN_SECONDS = int(os.environ.get('STREAM_TOKEN_SECONDS', '60'))
+STREAM_TOKEN_SCOPE = "events"
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', '4'))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 security = HTTPBearer()
 
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+# while bounding how many CPU cores a burst of logins can take
+_password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_CONCURRENCY,
+    thread_name_prefix="password-hash"
+)
+# Updated from both the event loop and the pool's threads
+_password_stats = {"queued": 0, "running": 0, "completed": 0, "maxQueued": 0}
+_password_stats_lock = threading.Lock()
+
 def hash_password(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
@@ -23,6 +43,56 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Check whether a bcrypt hash was made with a different cost factor than BCRYPT_ROUNDS"""
+    try:
+        rounds = int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != BCRYPT_ROUNDS or pwd_context.needs_update(hashed_password)
+
+def _run_password_job(func, *args):
+    with _password_stats_lock:
+        _password_stats["queued"] -= 1
+        _password_stats["running"] += 1
+    try:
+        return func(*args)
+    finally:
+        with _password_stats_lock:
+            _password_stats["running"] -= 1
+            _password_stats["completed"] += 1
+
+async def _submit_password_job(func, *args):
+    with _password_stats_lock:
+        _password_stats["queued"] += 1
+        _password_stats["maxQueued"] = max(_password_stats["maxQueued"], _password_stats["queued"])
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, _run_password_job, func, *args)
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password in the password thread pool"""
+    return await _submit_password_job(hash_password, password)
+
+def _verify_and_rehash(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    if not verify_password(plain_password, hashed_password):
+        return False, None
+    if password_needs_rehash(hashed_password):
+        return True, hash_password(plain_password)
+    return True, None
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password in the password thread pool.
+    Returns (valid, new_hash); new_hash is set when the stored hash should be
+    replaced because the configured cost factor changed.
+    """
+    return await _submit_password_job(_verify_and_rehash, plain_password, hashed_password)
+
+def get_password_hashing_stats() -> dict:
+    """Queue depth and throughput of the password thread pool"""
+    with _password_stats_lock:
+        return {"concurrency": PASSWORD_HASH_CONCURRENCY, "rounds": BCRYPT_ROUNDS, **_password_stats}
+
 def create_access_token(user_id: str) -> str:
     """Create a JWT access token"""
     expire = datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS)
@@ -33,17 +103,27 @@ def create_access_token(user_id: str) -> str:
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
-def decode_access_token(token: str) -> Optional[str]:
-    """Decode a JWT access token and return user_id"""
+def create_stream_token(user_id: str) -> str:
+    """Create a short-lived JWT that only opens the event stream"""
+    expire = datetime.utcnow() + timedelta(seconds=STREAM_TOKEN_SECONDS)
+    return jwt.encode({"sub": user_id, "exp": expire, "scope": STREAM_TOKEN_SCOPE}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def _decode_token(token: str) -> dict:
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user_id: str = payload.get("sub")
-        return user_id
+        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+def decode_access_token(token: str) -> Optional[str]:
+    """Decode a JWT access token and return user_id"""
+    payload = _decode_token(token)
+    # Stream tokens are only valid for the event stream
+    if payload.get("scope"):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return payload.get("sub")
+
 def get_current_user_id(credentials: HTTPAuthorizationCredentials = Security(security)) -> str:
     """Dependency to get current user ID from JWT token"""
     token = credentials.credentials
@@ -51,3 +131,12 @@ def get_current_user_id(credentials: HTTPAuthorizationCredentials = Security(sec
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
     return user_id
+
+def get_stream_user_id(token: Optional[str] = None) -> str:
+    """Dependency for the event stream: user ID from a ?token= stream token (see create_stream_token)"""
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    payload = _decode_token(token)
+    if payload.get("scope") != STREAM_TOKEN_SCOPE or not payload.get("sub"):
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    return payload["sub"]
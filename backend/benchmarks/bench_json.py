@@ -0,0 +1,150 @@
+"""
+JSON serialization throughput: FastAPI's default path (jsonable_encoder + json.dumps)
+vs. the orjson path used by responses.json_response, and for the feed also a pydantic v2
+serializer compiled from PostResponse.
+
+Builds synthetic feed, conversations and notifications pages shaped like the API's
+responses and renders each one repeatedly, without a database.
+
+    python benchmarks/bench_json.py
+    python benchmarks/bench_json.py --page-size 50 --seconds 2
+"""
+import argparse
+import random
+import string
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from models import PostResponse
+from responses import FastJSONResponse, orjson
+
+WORDS = ["que", "foto", "linda", "amei", "demais", "praia", "hoje", "saudade", "top", "incrível", "café", "viagem"]
+COMMENTS_PER_POST = 3
+
+def _id() -> str:
+    return str(ObjectId())
+
+def _text(words: int) -> str:
+    return " ".join(random.choices(WORDS, k=words))
+
+def _timestamp() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=random.randint(0, 7 * 24 * 3600))
+
+def _username() -> str:
+    return "".join(random.choices(string.ascii_lowercase, k=10))
+
+def feed_page(size: int) -> dict:
+    posts = []
+    for _ in range(size):
+        user_id = _id()
+        posts.append({
+            "id": _id(),
+            "userId": user_id,
+            "username": _username(),
+            "userProfilePicture": f"https://res.cloudinary.com/demo/image/upload/v1/instaclone/profiles/{user_id}.jpg",
+            "imageUrl": f"https://res.cloudinary.com/demo/image/upload/v1/instaclone/posts/{_id()}.jpg",
+            "caption": _text(12),
+            "likes": random.randint(0, 5000),
+            "liked": random.random() < 0.3,
+            "comments": [
+                {"id": _id(), "userId": _id(), "username": _username(), "text": _text(8), "timestamp": _timestamp()}
+                for _ in range(COMMENTS_PER_POST)
+            ],
+            "commentCount": random.randint(COMMENTS_PER_POST, 300),
+            "timestamp": _timestamp()
+        })
+    return {"posts": posts, "hasMore": True, "nextCursor": "eyJ0IjoiMjAyNi0wMS0wMVQwMDowMDowMCIsImlkIjoiYWJjIn0"}
+
+def conversations_page(size: int) -> dict:
+    return {"conversations": [
+        {
+            "userId": _id(),
+            "username": _username(),
+            "profilePicture": None,
+            "lastMessage": _text(10),
+            "timestamp": _timestamp(),
+            "unread": False,
+            "unreadCount": 0
+        }
+        for _ in range(size)
+    ], "nextCursor": None}
+
+def notifications_page(size: int) -> dict:
+    return {"notifications": [
+        {
+            "id": _id(),
+            "type": "like",
+            "actorId": _id(),
+            "actorUsername": _username(),
+            "actorProfilePicture": None,
+            "actorCount": 3,
+            "othersCount": 2,
+            "message": "curtiram sua foto",
+            "postId": _id(),
+            "postImage": f"https://res.cloudinary.com/demo/image/upload/v1/instaclone/posts/{_id()}.jpg",
+            "timestamp": _timestamp(),
+            "read": False
+        }
+        for _ in range(size)
+    ], "nextCursor": None, "readCursor": None}
+
+def standard(payload) -> bytes:
+    return JSONResponse(jsonable_encoder(payload)).body
+
+def fast(payload) -> bytes:
+    return FastJSONResponse(payload).body
+
+_posts_adapter = TypeAdapter(List[PostResponse])
+
+def pydantic_feed(payload) -> bytes:
+    return _posts_adapter.dump_json(_posts_adapter.validate_python(payload["posts"]))
+
+def throughput(render, payload, seconds: float) -> float:
+    """Renders per second"""
+    count = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        render(payload)
+        count += 1
+    return count / (time.perf_counter() - started)
+
+def main(args):
+    if orjson is None:
+        sys.exit("orjson is not installed: pip install orjson")
+    random.seed(args.seed)
+    payloads = [
+        ("feed", feed_page(args.page_size)),
+        ("conversations", conversations_page(args.page_size)),
+        ("notifications", notifications_page(args.page_size)),
+    ]
+    print(f"page size {args.page_size}, {args.seconds:.1f}s per run\n")
+    for name, payload in payloads:
+        renderers = [("jsonable_encoder+json", standard), ("orjson", fast)]
+        if name == "feed":
+            renderers.append(("pydantic PostResponse", pydantic_feed))
+        baseline = None
+        for label, render in renderers:
+            rate = throughput(render, payload, args.seconds)
+            baseline = baseline or rate
+            size = len(render(payload))
+            print(f"{name:14} {label:22} {rate:10,.0f} pages/s   {size / 1024:7.1f} KiB   x{rate / baseline:5.1f}")
+        print()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark JSON response rendering")
+    parser.add_argument("--page-size", type=int, default=20, help="items per page")
+    parser.add_argument("--seconds", type=float, default=1.0, help="duration of each run")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the synthetic payloads")
+    main(parser.parse_args())
@@ -0,0 +1,117 @@
+"""
+User search latency: legacy unanchored $regex vs. the searchKeys prefix query
+(capped at SEARCH_CANDIDATE_LIMIT candidates before ranking).
+
+Seeds a scratch database with synthetic users (1M by default), creates the
+API's indexes and times both query shapes for a set of prefixes.
+
+    python benchmarks/bench_user_search.py --users 1000000
+    python benchmarks/bench_user_search.py --skip-seed       # reuse seeded data
+    python benchmarks/bench_user_search.py --drop            # drop the scratch db afterwards
+
+Uses MONGO_URL from backend/.env; the database is DB_NAME + "_bench" unless --db is given.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import string
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from indexes import INDEXES
+from search import build_search_keys, search_pipeline
+
+FIRST_NAMES = ["Ana", "João", "Maria", "Pedro", "Lucas", "Júlia", "Gabriel", "Beatriz", "Rafael", "Larissa",
+               "Mateus", "Camila", "Felipe", "Letícia", "Bruno", "Mariana", "Thiago", "Fernanda", "Diego", "Sofia"]
+LAST_NAMES = ["Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima",
+              "Gomes", "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Araújo", "Barbosa"]
+PREFIXES = ["a", "an", "ana", "jo", "mari", "pedro", "sil", "zz", "lu", "gabriel_1", "xq"]
+SEED_BATCH = 10000
+RUNS = 20
+LIMIT = 20
+
+def _user(i: int) -> dict:
+    full_name = f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}"
+    username = f"{full_name.split()[0].lower()}_{i}_{''.join(random.choices(string.ascii_lowercase, k=3))}"
+    return {
+        "email": f"user{i}@bench.local",
+        "username": username,
+        "fullName": full_name,
+        "searchKeys": build_search_keys(username, full_name),
+        "followersCount": int(random.paretovariate(1.2)) - 1,
+        "followingCount": 0,
+    }
+
+async def seed(users, count: int):
+    await users.drop()
+    for start in range(0, count, SEED_BATCH):
+        await users.insert_many([_user(i) for i in range(start, min(start + SEED_BATCH, count))], ordered=False)
+        print(f"\rseeded {min(start + SEED_BATCH, count):,} users", end="", flush=True)
+    print()
+    await users.create_indexes(INDEXES["users"])
+
+async def time_query(users, query, sort=None) -> list:
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        cursor = users.find(query, {"username": 1})
+        if sort:
+            cursor = cursor.sort(sort)
+        await cursor.limit(LIMIT).to_list(LIMIT)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+async def time_pipeline(users, pipeline) -> list:
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        await users.aggregate(pipeline).to_list(LIMIT)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+def _summary(timings) -> str:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    return f"p50 {statistics.median(timings):8.2f} ms   p95 {p95:8.2f} ms"
+
+async def main(args):
+    load_dotenv(BACKEND_DIR / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[args.db or os.environ['DB_NAME'] + "_bench"]
+    users = db.users
+    try:
+        if not args.skip_seed:
+            await seed(users, args.users)
+        print(f"{await users.estimated_document_count():,} users in {db.name}\n")
+
+        for prefix in PREFIXES:
+            legacy = await time_query(users, {
+                "$or": [
+                    {"username": {"$regex": prefix, "$options": "i"}},
+                    {"fullName": {"$regex": prefix, "$options": "i"}}
+                ]
+            })
+            indexed = await time_pipeline(users, search_pipeline(prefix, LIMIT, {"username": 1}))
+            print(f"{prefix!r:12} legacy regex  {_summary(legacy)}")
+            print(f"{'':12} prefix index  {_summary(indexed)}")
+    finally:
+        if args.drop:
+            await client.drop_database(db.name)
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark user search")
+    parser.add_argument("--users", type=int, default=1_000_000, help="number of users to seed")
+    parser.add_argument("--db", help="scratch database name")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse previously seeded users")
+    parser.add_argument("--drop", action="store_true", help="drop the scratch database when done")
+    asyncio.run(main(parser.parse_args()))
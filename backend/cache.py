@@ -0,0 +1,163 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """Bounded in-process cache: least recently used entries are evicted first, and entries expire after ttl seconds"""
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value, ttl: Optional[float] = None):
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxSize": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else None
+        }
+
+class SharedCache:
+    """
+    Cache shared by every API worker (e.g. Redis), used behind the in-process tier.
+    Values must be JSON-serializable.
+    """
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, dict]:
+        raise NotImplementedError
+
+    async def set_many(self, values: Dict[str, dict], ttl: float):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+class LocalSharedCache(SharedCache):
+    """
+    Stand-in shared tier living in this process; exercises the two-tier path in
+    development and tests without an external cache server.
+    """
+    def __init__(self, max_size: int = 100000, ttl: float = 300):
+        self._cache = TTLCache(max_size, ttl)
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, dict]:
+        found = {}
+        for key in keys:
+            value = self._cache.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    async def set_many(self, values: Dict[str, dict], ttl: float):
+        for key, value in values.items():
+            self._cache.set(key, value, ttl)
+
+    async def delete(self, key: str):
+        self._cache.delete(key)
+
+class TwoTierCache:
+    """
+    In-process TTLCache in front of an optional SharedCache. Entries are invalidated
+    in both tiers and, through the event bus, in the other workers' in-process tiers.
+    """
+    def __init__(self, name: str, local: TTLCache, shared: Optional[SharedCache] = None):
+        self.name = name
+        self.local = local
+        self.shared = shared
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self._event_bus = None
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, dict]:
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+
+        if missing and self.shared:
+            try:
+                shared = await self.shared.get_many(missing)
+            except Exception as e:
+                logger.warning(f"{self.name} shared cache read failed: {str(e)}")
+                shared = {}
+            self.shared_hits += len(shared)
+            self.shared_misses += len(missing) - len(shared)
+            for key, value in shared.items():
+                self.local.set(key, value)
+            found.update(shared)
+        return found
+
+    async def set_many(self, values: Dict[str, dict]):
+        for key, value in values.items():
+            self.local.set(key, value)
+        if values and self.shared:
+            try:
+                await self.shared.set_many(values, self.local.ttl)
+            except Exception as e:
+                logger.warning(f"{self.name} shared cache write failed: {str(e)}")
+
+    async def invalidate(self, key: str):
+        self.local.delete(key)
+        if self.shared:
+            try:
+                await self.shared.delete(key)
+            except Exception as e:
+                logger.warning(f"{self.name} shared cache delete failed: {str(e)}")
+        if self._event_bus:
+            await self._event_bus.publish(self._channel, {"type": "invalidate", "key": key})
+
+    @property
+    def _channel(self) -> str:
+        return f"cache:{self.name}"
+
+    async def listen_for_invalidations(self, event_bus):
+        """Evict entries invalidated by other workers until cancelled"""
+        self._event_bus = event_bus
+        async with event_bus.subscribe(self._channel) as queue:
+            while True:
+                event = await queue.get()
+                self.local.delete(event["key"])
+
+    def get_stats(self) -> dict:
+        stats = self.local.get_stats()
+        if self.shared:
+            lookups = self.shared_hits + self.shared_misses
+            stats["shared"] = {
+                "hits": self.shared_hits,
+                "misses": self.shared_misses,
+                "hitRate": round(self.shared_hits / lookups, 4) if lookups else None
+            }
+        return stats
@@ -1,8 +1,12 @@
 import cloudinary
+import cloudinary.api
 import cloudinary.uploader
 import os
-from fastapi import UploadFile, HTTPException
-from typing import Optional
+import re
+from collections import defaultdict
+from typing import Dict, List
+
+from storage import MediaStorage
 
 # Configure Cloudinary
 cloudinary.config(
@@ -11,58 +15,97 @@ cloudinary.config(
     api_secret=os.environ.get('CLOUDINARY_API_SECRET')
 )
 
-async def upload_image_to_cloudinary(file: UploadFile, folder: str = "instaclone") -> str:
+# Videos are sent with upload_large in chunks of this size
+CLOUDINARY_CHUNK_SIZE = 20 * 1024 * 1024
+
+# Maximum public ids accepted by a single delete_resources call
+CLOUDINARY_DELETE_BATCH_SIZE = 100
+
+TRANSFORMATIONS = {
+    "video": [
+        {'width': 1080, 'height': 1920, 'crop': 'limit'},
+        {'quality': 'auto'}
+    ],
+    "image": [
+        {'width': 1080, 'height': 1080, 'crop': 'limit'},
+        {'quality': 'auto'}
+    ],
+}
+
+# Square stills for profile grids; videos get their first frame as a JPEG
+THUMBNAIL_TRANSFORMATIONS = {
+    "image": "c_fill,w_320,h_320,q_auto,f_auto",
+    "video": "so_0,c_fill,w_320,h_320,q_auto",
+}
+
+def parse_cloudinary_url(url: str):
     """
-    Upload an image or video to Cloudinary and return the URL
+    Extract (resource_type, public_id) from a Cloudinary delivery URL, e.g.
+    https://res.cloudinary.com/<cloud>/image/upload/v123/instaclone/posts/abc.jpg
+    -> ("image", "instaclone/posts/abc")
     """
-    try:
-        # Read file content
-        contents = await file.read()
-        
-        # Detect if it's a video
-        resource_type = "video" if file.content_type and file.content_type.startswith("video/") else "image"
-        
-        # Upload to Cloudinary
+    parts = url.split('/')
+    if "upload" not in parts:
+        return None, None
+    upload_index = parts.index("upload")
+    resource_type = parts[upload_index - 1] if upload_index > 0 else "image"
+    path = parts[upload_index + 1:]
+    # Skip the version segment
+    if path and re.fullmatch(r"v\d+", path[0]):
+        path = path[1:]
+    public_id = '/'.join(path).rsplit('.', 1)[0]
+    return resource_type, public_id
+
+class CloudinaryMediaStorage(MediaStorage):
+    def upload(self, path: str, folder: str, resource_type: str) -> str:
         if resource_type == "video":
-            result = cloudinary.uploader.upload(
-                contents,
+            result = cloudinary.uploader.upload_large(
+                path,
                 folder=folder,
                 resource_type="video",
-                transformation=[
-                    {'width': 1080, 'height': 1920, 'crop': 'limit'},
-                    {'quality': 'auto'}
-                ]
+                chunk_size=CLOUDINARY_CHUNK_SIZE,
+                transformation=TRANSFORMATIONS["video"]
             )
         else:
             result = cloudinary.uploader.upload(
-                contents,
+                path,
                 folder=folder,
                 resource_type="image",
-                transformation=[
-                    {'width': 1080, 'height': 1080, 'crop': 'limit'},
-                    {'quality': 'auto'}
-                ]
+                transformation=TRANSFORMATIONS["image"]
             )
-        
         return result['secure_url']
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error uploading image: {str(e)}")
-    finally:
-        await file.close()
 
-async def delete_image_from_cloudinary(image_url: str) -> bool:
-    """
-    Delete an image from Cloudinary
-    """
-    try:
-        # Extract public_id from URL
-        parts = image_url.split('/')
-        public_id_with_ext = '/'.join(parts[-2:])
-        public_id = public_id_with_ext.rsplit('.', 1)[0]
-        
-        # Delete from Cloudinary
-        result = cloudinary.uploader.destroy(public_id)
+    def delete(self, url: str) -> bool:
+        resource_type, public_id = parse_cloudinary_url(url)
+        if not public_id:
+            return False
+        result = cloudinary.uploader.destroy(public_id, resource_type=resource_type)
         return result.get('result') == 'ok'
-    except Exception as e:
-        print(f"Error deleting image: {str(e)}")
-        return False
+
+    def thumbnail_url(self, url: str) -> str:
+        resource_type, public_id = parse_cloudinary_url(url)
+        transformation = THUMBNAIL_TRANSFORMATIONS.get(resource_type)
+        if not public_id or not transformation:
+            return url
+        base = url.split('/upload/', 1)[0]
+        extension = "jpg" if resource_type == "video" else url.rsplit('.', 1)[-1]
+        return f"{base}/upload/{transformation}/{public_id}.{extension}"
+
+    def delete_many(self, urls: List[str]) -> Dict[str, bool]:
+        results = {}
+        by_type = defaultdict(dict)
+        for url in urls:
+            resource_type, public_id = parse_cloudinary_url(url)
+            if public_id:
+                by_type[resource_type][public_id] = url
+            else:
+                results[url] = False
+
+        for resource_type, urls_by_id in by_type.items():
+            public_ids = list(urls_by_id)
+            for start in range(0, len(public_ids), CLOUDINARY_DELETE_BATCH_SIZE):
+                batch = public_ids[start:start + CLOUDINARY_DELETE_BATCH_SIZE]
+                deleted = cloudinary.api.delete_resources(batch, resource_type=resource_type).get('deleted', {})
+                for public_id in batch:
+                    results[urls_by_id[public_id]] = deleted.get(public_id) in ('deleted', 'not_found')
+        return results
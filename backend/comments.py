@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+# Comments live in their own collection: {postId, userId, username, text, timestamp}
+# Posts carry a commentCount and a latestComments preview capped at COMMENT_PREVIEW_SIZE,
+# so the feed never loads a post's full comment history.
+COMMENT_PREVIEW_SIZE = 3
+
+def format_comment(comment: dict) -> dict:
+    return {
+        "id": str(comment.get("id") or comment["_id"]),
+        "userId": comment["userId"],
+        "username": comment["username"],
+        "text": comment["text"],
+        "timestamp": comment["timestamp"]
+    }
+
+async def add_comment(comments_collection, posts_collection, post_id: str, user_id: str, username: str, text: str):
+    """
+    Store a comment and update the post's counter and preview.
+    Returns (comment, post) where post has userId/imageUrl for the notification.
+    Raises LookupError if the post does not exist.
+    """
+    comment = {
+        "postId": post_id,
+        "userId": user_id,
+        "username": username,
+        "text": text,
+        "timestamp": datetime.utcnow()
+    }
+    result = await comments_collection.insert_one(comment)
+    comment["_id"] = result.inserted_id
+
+    preview = format_comment(comment)
+    post = await posts_collection.find_one_and_update(
+        {"_id": ObjectId(post_id)},
+        {
+            "$inc": {"commentCount": 1},
+            "$push": {"latestComments": {"$each": [preview], "$slice": -COMMENT_PREVIEW_SIZE}}
+        },
+        projection={"userId": 1, "imageUrl": 1}
+    )
+    if not post:
+        await comments_collection.delete_one({"_id": result.inserted_id})
+        raise LookupError(post_id)
+    return comment, post
@@ -0,0 +1,57 @@
+from typing import List
+
+from counters import decrement_user_counter
+
+# One document per pair of users, keyed by the sorted participant ids:
+# {_id: "a:b", participants: [a, b], lastMessage, lastMessageId, lastSenderId,
+#  lastTimestamp, unread: {a: n, b: m}}
+# The inbox is a single indexed query on participants + lastTimestamp.
+INBOX_SORT = [("lastTimestamp", -1), ("_id", -1)]
+
+def conversation_id(user_id: str, other_id: str) -> str:
+    return ":".join(sorted([user_id, other_id]))
+
+def head_update(message: dict) -> dict:
+    """Update applied to a conversation head for a newly sent message"""
+    sender_id = message["senderId"]
+    receiver_id = message["receiverId"]
+    return {
+        "$set": {
+            "participants": sorted([sender_id, receiver_id]),
+            "lastMessage": message["text"],
+            "lastMessageId": message["_id"],
+            "lastSenderId": sender_id,
+            "lastTimestamp": message["timestamp"]
+        },
+        "$inc": {f"unread.{receiver_id}": 1}
+    }
+
+async def record_message(conversations_collection, message: dict):
+    """Move the conversation head to a newly inserted message and bump the receiver's unread counter"""
+    await conversations_collection.update_one(
+        {"_id": conversation_id(message["senderId"], message["receiverId"])},
+        head_update(message),
+        upsert=True
+    )
+
+async def mark_conversation_read(conversations_collection, user_id: str, other_id: str):
+    """Reset user_id's unread counter for the conversation with other_id"""
+    await conversations_collection.update_one(
+        {"_id": conversation_id(user_id, other_id), f"unread.{user_id}": {"$gt": 0}},
+        {"$set": {f"unread.{user_id}": 0}}
+    )
+
+async def mark_messages_read(messages_collection, conversations_collection, users_collection,
+                             user_id: str, other_id: str) -> int:
+    """Mark every message other_id sent to user_id as read; returns how many changed"""
+    result = await messages_collection.update_many(
+        {"senderId": other_id, "receiverId": user_id, "read": False},
+        {"$set": {"read": True}}
+    )
+    await mark_conversation_read(conversations_collection, user_id, other_id)
+    await decrement_user_counter(users_collection, user_id, "unreadMessages", result.modified_count)
+    return result.modified_count
+
+def other_participant(conversation: dict, user_id: str) -> str:
+    participants: List[str] = conversation["participants"]
+    return participants[1] if participants[0] == user_id else participants[0]
@@ -0,0 +1,29 @@
+from typing import Iterable
+
+from bson import ObjectId
+
+# Unread badges are counters on the user document, so reading them is a single _id lookup:
+# unreadNotifications (see notifications.py) and unreadMessages (see conversations.py)
+UNREAD_COUNTERS_PROJECTION = {"unreadNotifications": 1, "unreadMessages": 1}
+
+async def increment_user_counters(users_collection, user_ids: Iterable[str], field: str):
+    """Add one to a counter on every listed user with a single update_many"""
+    object_ids = [ObjectId(user_id) for user_id in set(user_ids) if ObjectId.is_valid(user_id)]
+    if object_ids:
+        await users_collection.update_many({"_id": {"$in": object_ids}}, {"$inc": {field: 1}})
+
+async def decrement_user_counter(users_collection, user_id: str, field: str, amount: int):
+    """Subtract amount from a user counter without letting it drop below zero"""
+    if amount <= 0 or not ObjectId.is_valid(user_id):
+        return
+    await users_collection.update_one(
+        {"_id": ObjectId(user_id)},
+        [{"$set": {field: {"$max": [0, {"$subtract": [{"$ifNull": [f"${field}", 0]}, amount]}]}}}]
+    )
+
+async def get_unread_counts(users_collection, user_id: str) -> dict:
+    user = await users_collection.find_one({"_id": ObjectId(user_id)}, UNREAD_COUNTERS_PROJECTION) or {}
+    return {
+        "notifications": user.get("unreadNotifications", 0),
+        "messages": user.get("unreadMessages", 0)
+    }
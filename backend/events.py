@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Dict, Set
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+# Events waiting for a slow client beyond this are dropped; the client resyncs on reconnect
+SUBSCRIBER_QUEUE_SIZE = 100
+# Capped collection used by MongoEventBus
+EVENTS_COLLECTION_BYTES = 16 * 1024 * 1024
+
+class EventBus:
+    """
+    Per-user pub/sub for realtime events (new messages, read receipts, notifications).
+    """
+    async def publish(self, user_id: str, event: dict):
+        raise NotImplementedError
+
+    def subscribe(self, user_id: str):
+        """Async context manager yielding an asyncio.Queue of events for user_id"""
+        raise NotImplementedError
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+class InProcessEventBus(EventBus):
+    """
+    Delivers events to subscribers connected to this process only.
+    Enough for a single uvicorn worker and for local development.
+    """
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    async def publish(self, user_id: str, event: dict):
+        self._deliver(user_id, event)
+
+    def _deliver(self, user_id: str, event: dict):
+        for queue in self._subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logger.warning(f"Dropping event for slow subscriber {user_id}")
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: str):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers[user_id].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[user_id].discard(queue)
+            if not self._subscribers[user_id]:
+                del self._subscribers[user_id]
+
+class MongoEventBus(InProcessEventBus):
+    """
+    Fans events out across uvicorn workers through a capped collection: publish()
+    inserts, and every worker tails the collection and delivers to its own subscribers.
+    """
+    def __init__(self, db, collection_name: str = "events"):
+        super().__init__()
+        self.db = db
+        self.collection = db[collection_name]
+        self._tail_task = None
+
+    async def start(self):
+        try:
+            await self.db.create_collection(self.collection.name, capped=True, size=EVENTS_COLLECTION_BYTES)
+        except CollectionInvalid:
+            pass  # already exists
+        self._tail_task = asyncio.create_task(self._tail())
+
+    async def stop(self):
+        if self._tail_task:
+            self._tail_task.cancel()
+            await asyncio.gather(self._tail_task, return_exceptions=True)
+
+    async def publish(self, user_id: str, event: dict):
+        await self.collection.insert_one({"userId": user_id, "event": event, "createdAt": datetime.utcnow()})
+
+    async def _tail(self):
+        # Only deliver events published after this worker started
+        last = await self.collection.find_one({}, sort=[("$natural", -1)])
+        last_id = last["_id"] if last else None
+        while True:
+            try:
+                query = {"_id": {"$gt": last_id}} if last_id else {}
+                cursor = self.collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                async for doc in cursor:
+                    last_id = doc["_id"]
+                    self._deliver(doc["userId"], doc["event"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event bus tail error: {str(e)}")
+            # The cursor dies when the collection is empty or after an error; retry shortly
+            await asyncio.sleep(1)
+
+def create_event_bus(db) -> EventBus:
+    """Return the configured event bus (EVENT_BUS=memory|mongo)"""
+    if os.environ.get('EVENT_BUS', 'memory') == 'mongo':
+        return MongoEventBus(db)
+    return InProcessEventBus()
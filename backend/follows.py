@@ -0,0 +1,84 @@
+from datetime import datetime
+from typing import Iterable, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from pagination import NEWEST_FIRST, next_cursor, with_cursor
+
+# Follow edges live in their own collection, one document per (follower, followee):
+# {followerId, followeeId, timestamp}
+# Users carry denormalized followersCount/followingCount counters.
+
+def _inc_counters(follower_id: str, followee_id: str, delta: int) -> List[UpdateOne]:
+    return [
+        UpdateOne({"_id": ObjectId(follower_id)}, {"$inc": {"followingCount": delta}}),
+        UpdateOne({"_id": ObjectId(followee_id)}, {"$inc": {"followersCount": delta}}),
+    ]
+
+async def add_follow(follows_collection, users_collection, follower_id: str, followee_id: str) -> bool:
+    """Create a follow edge; returns False if it already existed"""
+    try:
+        result = await follows_collection.update_one(
+            {"followerId": follower_id, "followeeId": followee_id},
+            {"$setOnInsert": {"timestamp": datetime.utcnow()}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Lost a race with a concurrent follow of the same user
+        return False
+    if result.upserted_id is None:
+        return False
+
+    # Counters only move when the edge was actually created
+    await users_collection.bulk_write(_inc_counters(follower_id, followee_id, 1), ordered=False)
+    return True
+
+async def remove_follow(follows_collection, users_collection, follower_id: str, followee_id: str) -> bool:
+    """Delete a follow edge; returns False if there was none"""
+    result = await follows_collection.delete_one({"followerId": follower_id, "followeeId": followee_id})
+    if not result.deleted_count:
+        return False
+    await users_collection.bulk_write(_inc_counters(follower_id, followee_id, -1), ordered=False)
+    return True
+
+async def get_following_ids(follows_collection, user_id: str) -> List[str]:
+    """Ids of every user that user_id follows"""
+    edges = await follows_collection.find({"followerId": user_id}, {"_id": 0, "followeeId": 1}).to_list(None)
+    return [edge["followeeId"] for edge in edges]
+
+async def get_followed_subset(follows_collection, user_id: str, candidate_ids: Iterable[str]) -> Set[str]:
+    """Which of candidate_ids user_id follows, in one query"""
+    candidate_ids = list(set(candidate_ids))
+    if not candidate_ids:
+        return set()
+    edges = await follows_collection.find(
+        {"followerId": user_id, "followeeId": {"$in": candidate_ids}},
+        {"_id": 0, "followeeId": 1}
+    ).to_list(len(candidate_ids))
+    return {edge["followeeId"] for edge in edges}
+
+async def is_following(follows_collection, user_id: str, other_id: str) -> bool:
+    return await follows_collection.find_one(
+        {"followerId": user_id, "followeeId": other_id}, {"_id": 1}
+    ) is not None
+
+# Per list: (edge field holding the profile owner, edge field holding the listed users)
+FOLLOW_LISTS = {
+    "followers": ("followeeId", "followerId"),
+    "following": ("followerId", "followeeId"),
+}
+
+async def get_follow_page(follows_collection, user_id: str, list_name: str,
+                          cursor: Optional[str], limit: int) -> Tuple[List[str], Optional[str]]:
+    """
+    One page of a user's followers or following, most recent first, using the
+    followeeId_timestamp/followerId_timestamp indexes. Returns (user ids, next cursor).
+    """
+    owner_field, other_field = FOLLOW_LISTS[list_name]
+    edges = await follows_collection.find(
+        with_cursor({owner_field: user_id}, cursor),
+        {"_id": 1, "timestamp": 1, other_field: 1}
+    ).sort(NEWEST_FIRST).limit(limit).to_list(limit)
+    return [edge[other_field] for edge in edges], next_cursor(edges, limit)
@@ -0,0 +1,64 @@
+import os
+import time
+from typing import Dict, Iterable
+from bson import ObjectId
+
+from cache import LocalSharedCache, TTLCache, TwoTierCache
+
+# Only the fields needed to render an author/actor next to a post, story or message
+USER_CARD_PROJECTION = {"username": 1, "profilePicture": 1}
+
+# Cards are cached per worker (and optionally in a shared tier); update_profile invalidates them,
+# the TTL bounds how long a missed invalidation can serve a stale avatar
+USER_CARD_CACHE_SIZE = int(os.environ.get('USER_CARD_CACHE_SIZE', '10000'))
+USER_CARD_CACHE_TTL = float(os.environ.get('USER_CARD_CACHE_TTL', '60'))
+
+def _shared_tier():
+    """USER_CARD_SHARED_CACHE=local enables the in-process stand-in for a shared cache"""
+    if os.environ.get('USER_CARD_SHARED_CACHE') == 'local':
+        return LocalSharedCache()
+    return None
+
+def card_epoch() -> int:
+    """
+    Changes every USER_CARD_CACHE_TTL seconds. ETags of responses carrying user cards
+    include it, so a changed avatar is picked up no later than the card cache would.
+    """
+    return int(time.time() // USER_CARD_CACHE_TTL)
+
+user_card_cache = TwoTierCache("user_cards", TTLCache(USER_CARD_CACHE_SIZE, USER_CARD_CACHE_TTL), _shared_tier())
+
+async def fetch_user_cards(users_collection, user_ids: Iterable[str]) -> Dict[str, dict]:
+    """
+    Fetch username/profilePicture for every distinct user id, from the card cache or
+    with a single $in query for the ones not cached.
+    Returns a dict keyed by user id; unknown or deleted users are simply absent.
+    """
+    keys = {user_id for user_id in user_ids if ObjectId.is_valid(user_id)}
+    if not keys:
+        return {}
+
+    cards = await user_card_cache.get_many(keys)
+    missing = [ObjectId(user_id) for user_id in keys if user_id not in cards]
+    if not missing:
+        return cards
+
+    users = await users_collection.find(
+        {"_id": {"$in": missing}},
+        USER_CARD_PROJECTION
+    ).to_list(len(missing))
+
+    fetched = {
+        str(user["_id"]): {
+            "username": user["username"],
+            "profilePicture": user.get("profilePicture")
+        }
+        for user in users
+    }
+    await user_card_cache.set_many(fetched)
+    cards.update(fetched)
+    return cards
+
+async def invalidate_user_card(user_id: str):
+    """Drop a user's cached card after their username or profile picture changes"""
+    await user_card_cache.invalidate(user_id)
@@ -0,0 +1,250 @@
+"""
+Index declarations for every collection the API queries.
+
+`ensure_indexes` runs on app startup and is idempotent: createIndexes is a no-op
+for indexes that already exist with the same spec, and indexes listed in
+OBSOLETE_INDEXES are dropped once replaced.
+
+Run `python indexes.py` to create the indexes from the command line, or
+`python indexes.py --check` to also explain() each route's query shape and
+exit non-zero if any of them still plans a COLLSCAN.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from timeline import TIMELINE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel(
+            [("searchKeys", ASCENDING), ("followersCount", DESCENDING), ("_id", DESCENDING)],
+            name="searchKeys_followersCount"
+        ),
+        IndexModel([("followersCount", DESCENDING), ("_id", DESCENDING)], name="followersCount"),
+    ],
+    "posts": [
+        IndexModel([("userId", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="userId_timestamp"),
+        IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)], name="timestamp"),
+    ],
+    "stories": [
+        IndexModel([("userId", ASCENDING), ("expiresAt", ASCENDING)], name="userId_expiresAt"),
+        # Expired stories are removed by MongoDB; also serves the discovery query on expiresAt
+        IndexModel([("expiresAt", ASCENDING)], name="expiresAt_ttl", expireAfterSeconds=0),
+    ],
+    "messages": [
+        # Serves both branches of the conversation $or and the mark-as-read update
+        IndexModel(
+            [("senderId", ASCENDING), ("receiverId", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+            name="senderId_receiverId_timestamp"
+        ),
+        IndexModel([("receiverId", ASCENDING), ("timestamp", DESCENDING)], name="receiverId_timestamp"),
+        # Only messages sent by background share jobs carry shareId
+        IndexModel(
+            [("shareId", ASCENDING), ("receiverId", ASCENDING)],
+            name="shareId_receiverId",
+            partialFilterExpression={"shareId": {"$exists": True}}
+        ),
+    ],
+    "conversations": [
+        IndexModel(
+            [("participants", ASCENDING), ("lastTimestamp", DESCENDING), ("_id", DESCENDING)],
+            name="participants_lastTimestamp"
+        ),
+    ],
+    "notifications": [
+        IndexModel([("userId", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="userId_timestamp"),
+        # Target of the collapsing upsert; only collapsible notifications carry window
+        IndexModel(
+            [("userId", ASCENDING), ("postId", ASCENDING), ("type", ASCENDING), ("window", ASCENDING)],
+            name="userId_postId_type_window",
+            partialFilterExpression={"window": {"$exists": True}}
+        ),
+    ],
+    "story_views": [
+        IndexModel([("storyId", ASCENDING), ("userId", ASCENDING)], name="storyId_userId_unique", unique=True),
+        IndexModel([("storyId", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="storyId_timestamp"),
+        IndexModel([("expiresAt", ASCENDING)], name="expiresAt_ttl", expireAfterSeconds=0),
+    ],
+    "timelines": [
+        IndexModel([("builtAt", ASCENDING)], name="builtAt_ttl", expireAfterSeconds=TIMELINE_TTL_SECONDS),
+    ],
+    "follows": [
+        IndexModel([("followerId", ASCENDING), ("followeeId", ASCENDING)], name="followerId_followeeId_unique", unique=True),
+        IndexModel([("followerId", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="followerId_timestamp"),
+        IndexModel([("followeeId", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="followeeId_timestamp"),
+    ],
+    "post_likes": [
+        IndexModel([("postId", ASCENDING), ("userId", ASCENDING)], name="postId_userId_unique", unique=True),
+    ],
+    "comments": [
+        IndexModel([("postId", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="postId_timestamp"),
+    ],
+    "user_suggestions": [
+        IndexModel([("updatedAt", ASCENDING)], name="updatedAt"),
+    ],
+    "media_garbage": [
+        IndexModel([("status", ASCENDING), ("nextAttemptAt", ASCENDING)], name="status_nextAttemptAt"),
+    ],
+    "share_jobs": [
+        IndexModel([("status", ASCENDING), ("createdAt", ASCENDING)], name="status_createdAt"),
+    ],
+}
+
+# Indexes replaced by the ones above, dropped by ensure_indexes if present
+OBSOLETE_INDEXES = {
+    "stories": ["userId_timestamp", "timestamp"],
+}
+
+# (route, collection, filter, sort) for every query the API issues
+_SAMPLE_ID = "000000000000000000000000"
+_SAMPLE_TIME = datetime(2024, 1, 1)
+QUERY_SHAPES = [
+    ("POST /auth/register", "users", {"email": "a@example.com"}, None),
+    ("POST /auth/register", "users", {"username": "a"}, None),
+    ("POST /auth/login", "users", {"email": "a@example.com"}, None),
+    ("GET /users/{user_id}/posts", "posts", {"userId": _SAMPLE_ID}, [("timestamp", -1), ("_id", -1)]),
+    ("GET /users/{user_id}/followers", "follows", {"followeeId": _SAMPLE_ID}, [("timestamp", -1), ("_id", -1)]),
+    ("GET /users/{user_id}/following", "follows", {"followerId": _SAMPLE_ID}, [("timestamp", -1), ("_id", -1)]),
+    ("GET /users/search", "users", {"searchKeys": {"$regex": "^ana"}}, None),
+    ("GET /users/search (empty)", "users", {}, [("followersCount", -1), ("_id", -1)]),
+    ("GET /users/{id_or_username}", "users", {"username": "a"}, None),
+    ("GET /users/suggestions", "follows", {"followerId": {"$in": [_SAMPLE_ID]}}, None),
+    ("suggestions refresher", "user_suggestions", {"updatedAt": {"$lt": _SAMPLE_TIME}}, [("updatedAt", 1)]),
+    ("GET /posts/feed", "posts", {"userId": {"$in": [_SAMPLE_ID, _SAMPLE_ID[:-1] + "1"]}},
+     [("timestamp", -1), ("_id", -1)]),
+    ("GET /posts/feed (discovery)", "posts", {}, [("timestamp", -1), ("_id", -1)]),
+    ("GET /stories", "stories", {"userId": {"$in": [_SAMPLE_ID]}, "expiresAt": {"$gt": _SAMPLE_TIME}}, None),
+    ("GET /stories (discovery)", "stories", {"expiresAt": {"$gt": _SAMPLE_TIME}}, [("expiresAt", -1)]),
+    ("GET /stories (etag)", "story_views", {"storyId": {"$in": [_SAMPLE_ID]}, "userId": _SAMPLE_ID}, None),
+    ("GET /messages/conversations", "conversations", {"participants": _SAMPLE_ID},
+     [("lastTimestamp", -1), ("_id", -1)]),
+    ("GET /messages/{user_id}", "messages",
+     {"$or": [{"senderId": _SAMPLE_ID, "receiverId": _SAMPLE_ID[:-1] + "1"},
+              {"senderId": _SAMPLE_ID[:-1] + "1", "receiverId": _SAMPLE_ID}]},
+     [("timestamp", -1), ("_id", -1)]),
+    ("POST /messages/{user_id}/read", "messages",
+     {"senderId": _SAMPLE_ID, "receiverId": _SAMPLE_ID[:-1] + "1", "read": False}, None),
+    ("POST /stories/{story_id}/view", "story_views", {"storyId": _SAMPLE_ID, "userId": _SAMPLE_ID}, None),
+    ("GET /stories/{story_id}/views", "story_views", {"storyId": _SAMPLE_ID}, [("timestamp", -1), ("_id", -1)]),
+    ("GET /notifications", "notifications", {"userId": _SAMPLE_ID}, [("timestamp", -1), ("_id", -1)]),
+    ("POST /notifications/read", "notifications",
+     {"userId": _SAMPLE_ID, "read": False, "timestamp": {"$lt": _SAMPLE_TIME}}, None),
+    ("GET /posts/feed (following)", "follows", {"followerId": _SAMPLE_ID}, None),
+    ("GET /users/search (isFollowing)", "follows", {"followerId": _SAMPLE_ID, "followeeId": {"$in": [_SAMPLE_ID]}}, None),
+    ("POST /posts (fan-out)", "follows", {"followeeId": _SAMPLE_ID}, None),
+    ("GET /posts/feed (liked)", "post_likes", {"postId": {"$in": [_SAMPLE_ID]}, "userId": _SAMPLE_ID}, None),
+    ("DELETE /posts/{post_id} (likes)", "post_likes", {"postId": _SAMPLE_ID}, None),
+    ("GET /posts/{post_id}/comments", "comments", {"postId": _SAMPLE_ID}, [("timestamp", -1), ("_id", -1)]),
+    ("media garbage worker", "media_garbage", {"status": "pending", "nextAttemptAt": {"$lte": _SAMPLE_TIME}},
+     [("nextAttemptAt", 1)]),
+    ("POST /posts/{post_id}/share", "users", {"_id": {"$in": [ObjectId(_SAMPLE_ID)]}}, None),
+    ("notification batcher (collapse)", "notifications",
+     {"userId": _SAMPLE_ID, "postId": _SAMPLE_ID, "type": "like", "window": 1, "read": False}, None),
+    ("share worker", "share_jobs", {"status": "pending"}, [("createdAt", 1)]),
+    ("share worker (retry)", "messages", {"shareId": ObjectId(_SAMPLE_ID)}, None),
+]
+
+async def ensure_indexes(db):
+    """Create every declared index, logging failures instead of aborting startup"""
+    for collection_name, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                await db[collection_name].create_indexes([index])
+            except OperationFailure as e:
+                # e.g. duplicate keys blocking a unique index; the API still works without it
+                logger.error(f"Could not create index {collection_name}.{index.document['name']}: {e}")
+
+    for collection_name, names in OBSOLETE_INDEXES.items():
+        existing = await db[collection_name].index_information()
+        for name in names:
+            if name not in existing:
+                continue
+            try:
+                await db[collection_name].drop_index(name)
+                logger.info(f"Dropped obsolete index {collection_name}.{name}")
+            except OperationFailure as e:
+                logger.error(f"Could not drop index {collection_name}.{name}: {e}")
+
+    await log_index_builds_in_progress(db)
+
+async def log_index_builds_in_progress(db):
+    """Log index builds that are still running on the server (e.g. started by another worker)"""
+    try:
+        result = await db.client.admin.command({
+            "currentOp": True,
+            "$or": [
+                {"op": "command", "command.createIndexes": {"$exists": True}},
+                {"op": "none", "msg": {"$regex": "^Index Build"}},
+            ]
+        })
+    except OperationFailure as e:
+        logger.warning(f"Could not inspect index builds in progress: {e}")
+        return
+
+    for op in result.get("inprog", []):
+        if op.get("ns", "").split(".", 1)[0] != db.name:
+            continue
+        logger.info(f"Index build in progress on {op.get('ns')}: {op.get('msg') or op.get('command')}")
+
+def _plan_stages(plan):
+    """Yield every stage name found in an explain() plan tree"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+async def check_query_plans(db) -> bool:
+    """explain() each route's query shape; return False if any of them plans a COLLSCAN"""
+    ok = True
+    for route, collection_name, query, sort in QUERY_SHAPES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = set(_plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {})))
+        if "COLLSCAN" in stages:
+            ok = False
+            logger.error(f"{route}: {collection_name} query plans a COLLSCAN")
+        else:
+            logger.info(f"{route}: {collection_name} uses {', '.join(sorted(stages))}")
+    return ok
+
+async def main(check: bool) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        await ensure_indexes(db)
+        if check and not await check_query_plans(db):
+            return 1
+        return 0
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the API's MongoDB indexes")
+    parser.add_argument("--check", action="store_true", help="fail if any route's query plans a COLLSCAN")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(main(args.check)))
@@ -0,0 +1,55 @@
+from datetime import datetime
+from typing import Iterable, Optional, Set
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+# Likes live in their own collection, one document per (postId, userId):
+# {postId, userId, timestamp}
+# Posts carry a denormalized likeCount.
+
+async def add_like(post_likes_collection, posts_collection, post_id: str, user_id: str) -> Optional[dict]:
+    """
+    Record a like. Returns the post (userId, imageUrl) when the like is new,
+    None when the user had already liked it.
+    Raises LookupError if the post does not exist.
+    """
+    try:
+        result = await post_likes_collection.update_one(
+            {"postId": post_id, "userId": user_id},
+            {"$setOnInsert": {"timestamp": datetime.utcnow()}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return None
+    if result.upserted_id is None:
+        return None
+
+    post = await posts_collection.find_one_and_update(
+        {"_id": ObjectId(post_id)},
+        {"$inc": {"likeCount": 1}},
+        projection={"userId": 1, "imageUrl": 1}
+    )
+    if not post:
+        await post_likes_collection.delete_one({"_id": result.upserted_id})
+        raise LookupError(post_id)
+    return post
+
+async def remove_like(post_likes_collection, posts_collection, post_id: str, user_id: str) -> bool:
+    """Remove a like; returns False if the user had not liked the post"""
+    result = await post_likes_collection.delete_one({"postId": post_id, "userId": user_id})
+    if not result.deleted_count:
+        return False
+    await posts_collection.update_one({"_id": ObjectId(post_id)}, {"$inc": {"likeCount": -1}})
+    return True
+
+async def get_liked_subset(post_likes_collection, user_id: str, post_ids: Iterable[str]) -> Set[str]:
+    """Which of post_ids the user has liked, in one query"""
+    post_ids = list(set(post_ids))
+    if not post_ids:
+        return set()
+    likes = await post_likes_collection.find(
+        {"postId": {"$in": post_ids}, "userId": user_id},
+        {"_id": 0, "postId": 1}
+    ).to_list(len(post_ids))
+    return {like["postId"] for like in likes}
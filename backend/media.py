@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+from fastapi import UploadFile, HTTPException
+
+from storage import get_media_storage
+
+logger = logging.getLogger(__name__)
+
+# Uploads are read from the request in chunks of this size and spooled to a temp file
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Per-type size limits
+MAX_UPLOAD_BYTES = {
+    "image": int(os.environ.get('MAX_IMAGE_UPLOAD_MB', '10')) * 1024 * 1024,
+    "video": int(os.environ.get('MAX_VIDEO_UPLOAD_MB', '100')) * 1024 * 1024,
+}
+
+# Storage SDK calls are blocking network I/O; keep them off the event loop
+MEDIA_UPLOAD_CONCURRENCY = int(os.environ.get('MEDIA_UPLOAD_CONCURRENCY', '8'))
+_media_executor = ThreadPoolExecutor(max_workers=MEDIA_UPLOAD_CONCURRENCY, thread_name_prefix="media")
+
+def detect_resource_type(file: UploadFile) -> str:
+    return "video" if file.content_type and file.content_type.startswith("video/") else "image"
+
+def _too_large(resource_type: str) -> HTTPException:
+    limit_mb = MAX_UPLOAD_BYTES[resource_type] // (1024 * 1024)
+    return HTTPException(status_code=413, detail=f"File too large (max {limit_mb} MB for {resource_type})")
+
+async def spool_upload(file: UploadFile, max_bytes: int, resource_type: str) -> str:
+    """
+    Copy an upload to a temp file chunk by chunk, enforcing the size limit.
+    Returns the temp file path; the caller is responsible for removing it.
+    """
+    suffix = Path(file.filename or "").suffix
+    spooled = tempfile.NamedTemporaryFile(prefix="upload-", suffix=suffix, delete=False)
+    size = 0
+    try:
+        with spooled:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(resource_type)
+                spooled.write(chunk)
+        return spooled.name
+    except BaseException:
+        os.unlink(spooled.name)
+        raise
+
+async def upload_media(file: UploadFile, folder: str = "instaclone") -> str:
+    """
+    Upload an image or video to the configured storage and return the URL
+    """
+    resource_type = detect_resource_type(file)
+    max_bytes = MAX_UPLOAD_BYTES[resource_type]
+    path = None
+    try:
+        # Reject early when the client declared the size
+        if file.size is not None and file.size > max_bytes:
+            raise _too_large(resource_type)
+
+        path = await spool_upload(file, max_bytes, resource_type)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _media_executor, get_media_storage().upload, path, folder, resource_type
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error uploading image: {str(e)}")
+    finally:
+        if path:
+            os.unlink(path)
+        await file.close()
+
+def thumbnail_url(url: str) -> str:
+    """Grid thumbnail for a media URL returned by upload_media"""
+    return get_media_storage().thumbnail_url(url)
+
+async def delete_media_batch(urls: List[str]) -> Dict[str, bool]:
+    """
+    Delete many images/videos with the storage's bulk API; returns url -> deleted.
+    Errors propagate so the caller can retry.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_media_executor, get_media_storage().delete_many, urls)
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from media import delete_media_batch
+
+logger = logging.getLogger(__name__)
+
+MEDIA_GC_BATCH_SIZE = int(os.environ.get('MEDIA_GC_BATCH_SIZE', '100'))
+MEDIA_GC_POLL_SECONDS = float(os.environ.get('MEDIA_GC_POLL_SECONDS', '5'))
+MEDIA_GC_MAX_ATTEMPTS = int(os.environ.get('MEDIA_GC_MAX_ATTEMPTS', '8'))
+MEDIA_GC_BACKOFF_SECONDS = 30
+MEDIA_GC_MAX_BACKOFF_SECONDS = 6 * 60 * 60
+# How long a claimed job is hidden from other workers while it is processed
+MEDIA_GC_LEASE_SECONDS = 5 * 60
+
+async def enqueue_media_deletion(media_garbage_collection, urls: Iterable[str]):
+    """Record media URLs to be deleted from storage by the background worker"""
+    now = datetime.utcnow()
+    jobs = [
+        {
+            "url": url,
+            "status": "pending",
+            "attempts": 0,
+            "nextAttemptAt": now,
+            "createdAt": now
+        }
+        for url in urls if url
+    ]
+    if jobs:
+        await media_garbage_collection.insert_many(jobs, ordered=False)
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(MEDIA_GC_BACKOFF_SECONDS * 2 ** (attempts - 1), MEDIA_GC_MAX_BACKOFF_SECONDS))
+
+async def process_media_garbage_batch(media_garbage_collection) -> int:
+    """Delete one batch of due media; returns how many jobs were claimed"""
+    now = datetime.utcnow()
+    jobs = await media_garbage_collection.find(
+        {"status": "pending", "nextAttemptAt": {"$lte": now}}
+    ).sort("nextAttemptAt", 1).limit(MEDIA_GC_BATCH_SIZE).to_list(MEDIA_GC_BATCH_SIZE)
+    if not jobs:
+        return 0
+
+    # Claim the batch so other workers skip it; deletes are idempotent if two workers race
+    await media_garbage_collection.update_many(
+        {"_id": {"$in": [job["_id"] for job in jobs]}},
+        {"$set": {"nextAttemptAt": now + timedelta(seconds=MEDIA_GC_LEASE_SECONDS)}}
+    )
+
+    try:
+        results = await delete_media_batch([job["url"] for job in jobs])
+        error = "not deleted"
+    except Exception as e:
+        logger.warning(f"Media deletion batch failed: {str(e)}")
+        results = {}
+        error = str(e)
+
+    done = [job["_id"] for job in jobs if results.get(job["url"])]
+    if done:
+        await media_garbage_collection.delete_many({"_id": {"$in": done}})
+
+    for job in jobs:
+        if results.get(job["url"]):
+            continue
+        attempts = job["attempts"] + 1
+        update = {"attempts": attempts, "lastError": error, "nextAttemptAt": now + _backoff(attempts)}
+        if attempts >= MEDIA_GC_MAX_ATTEMPTS:
+            update["status"] = "failed"
+            logger.error(f"Giving up deleting media {job['url']} after {attempts} attempts")
+        await media_garbage_collection.update_one({"_id": job["_id"]}, {"$set": update})
+
+    return len(jobs)
+
+async def run_media_garbage_worker(media_garbage_collection):
+    """Drain the media garbage queue until cancelled"""
+    while True:
+        try:
+            claimed = await process_media_garbage_batch(media_garbage_collection)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Media garbage worker error: {str(e)}")
+            claimed = 0
+        # Keep draining while there is a backlog
+        if claimed < MEDIA_GC_BATCH_SIZE:
+            await asyncio.sleep(MEDIA_GC_POLL_SECONDS)
@@ -0,0 +1,319 @@
+"""
+One-off data migrations. Each step is idempotent and can be re-run safely.
+
+    python migrate.py            # run every step
+    python migrate.py follows    # run selected steps
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+async def _flush(collection, operations):
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+    return []
+
+async def migrate_follows(db):
+    """Move the embedded followers/following arrays into the follows edge collection"""
+    users = db.users
+    follows = db.follows
+    now = datetime.utcnow()
+
+    # Both arrays describe the same edges; take the union so a half-applied
+    # follow (present on only one side) is not lost
+    operations = []
+    migrated = 0
+    async for user in users.find(
+        {"$or": [{"followers": {"$exists": True}}, {"following": {"$exists": True}}]},
+        {"followers": 1, "following": 1}
+    ):
+        user_id = str(user["_id"])
+        edges = [(user_id, followee_id) for followee_id in user.get("following", [])]
+        edges += [(follower_id, user_id) for follower_id in user.get("followers", [])]
+        for follower_id, followee_id in edges:
+            operations.append(UpdateOne(
+                {"followerId": follower_id, "followeeId": followee_id},
+                {"$setOnInsert": {"timestamp": now}},
+                upsert=True
+            ))
+            if len(operations) >= BATCH_SIZE:
+                operations = await _flush(follows, operations)
+        migrated += 1
+    await _flush(follows, operations)
+    logger.info(f"Migrated follow edges of {migrated} users")
+
+    await recount_follows(db)
+    await users.update_many(
+        {"$or": [{"followers": {"$exists": True}}, {"following": {"$exists": True}}]},
+        {"$unset": {"followers": "", "following": ""}}
+    )
+
+async def recount_follows(db):
+    """Recompute followersCount/followingCount from the follows collection"""
+    users = db.users
+    await users.update_many({}, {"$set": {"followersCount": 0, "followingCount": 0}})
+    for group_field, counter in (("$followeeId", "followersCount"), ("$followerId", "followingCount")):
+        operations = []
+        async for row in db.follows.aggregate([{"$group": {"_id": group_field, "count": {"$sum": 1}}}]):
+            operations.append(UpdateOne({"_id": _object_id(row["_id"])}, {"$set": {counter: row["count"]}}))
+            if len(operations) >= BATCH_SIZE:
+                operations = await _flush(users, operations)
+        await _flush(users, operations)
+
+def _object_id(value):
+    return ObjectId(value) if ObjectId.is_valid(value) else value
+
+async def migrate_likes(db):
+    """Move the embedded post likes arrays into the post_likes collection"""
+    posts = db.posts
+    post_likes = db.post_likes
+    now = datetime.utcnow()
+
+    operations = []
+    counters = []
+    async for post in posts.find({"likes": {"$exists": True}}, {"likes": 1}):
+        post_id = str(post["_id"])
+        user_ids = set(post.get("likes") or [])
+        for user_id in user_ids:
+            operations.append(UpdateOne(
+                {"postId": post_id, "userId": user_id},
+                {"$setOnInsert": {"timestamp": now}},
+                upsert=True
+            ))
+        counters.append(UpdateOne(
+            {"_id": post["_id"]},
+            {"$set": {"likeCount": len(user_ids)}, "$unset": {"likes": ""}}
+        ))
+        if len(operations) >= BATCH_SIZE:
+            operations = await _flush(post_likes, operations)
+        # Only drop the arrays once their edges are written
+        if len(counters) >= BATCH_SIZE:
+            operations = await _flush(post_likes, operations)
+            counters = await _flush(posts, counters)
+    await _flush(post_likes, operations)
+    await _flush(posts, counters)
+
+async def migrate_comments(db):
+    """Move the embedded post comments arrays into the comments collection"""
+    from comments import COMMENT_PREVIEW_SIZE, format_comment
+
+    posts = db.posts
+    comments = db.comments
+
+    async for post in posts.find({"comments": {"$exists": True}}, {"comments": 1}):
+        post_id = str(post["_id"])
+        embedded = post.get("comments") or []
+        operations = []
+        for comment in embedded:
+            # Keep the embedded comment id so re-running does not duplicate comments
+            comment_id = ObjectId(comment["id"]) if ObjectId.is_valid(comment.get("id", "")) else ObjectId()
+            operations.append(UpdateOne(
+                {"_id": comment_id},
+                {"$setOnInsert": {
+                    "postId": post_id,
+                    "userId": comment["userId"],
+                    "username": comment["username"],
+                    "text": comment["text"],
+                    "timestamp": comment["timestamp"]
+                }},
+                upsert=True
+            ))
+            if len(operations) >= BATCH_SIZE:
+                operations = await _flush(comments, operations)
+        await _flush(comments, operations)
+
+        await posts.update_one(
+            {"_id": post["_id"]},
+            {
+                "$set": {
+                    "commentCount": len(embedded),
+                    "latestComments": [format_comment(c) for c in embedded[-COMMENT_PREVIEW_SIZE:]]
+                },
+                "$unset": {"comments": ""}
+            }
+        )
+
+async def migrate_search_keys(db):
+    """Populate searchKeys used by the prefix user search"""
+    from search import build_search_keys
+
+    users = db.users
+    operations = []
+    async for user in users.find({}, {"username": 1, "fullName": 1}):
+        operations.append(UpdateOne(
+            {"_id": user["_id"]},
+            {"$set": {"searchKeys": build_search_keys(user["username"], user.get("fullName", ""))}}
+        ))
+        if len(operations) >= BATCH_SIZE:
+            operations = await _flush(users, operations)
+    await _flush(users, operations)
+
+async def migrate_conversations(db):
+    """Build the conversations collection (inbox heads) from existing messages"""
+    pipeline = [
+        {"$sort": {"timestamp": -1}},
+        {"$group": {
+            "_id": {
+                "$cond": [
+                    {"$lt": ["$senderId", "$receiverId"]},
+                    ["$senderId", "$receiverId"],
+                    ["$receiverId", "$senderId"]
+                ]
+            },
+            "lastMessage": {"$first": "$text"},
+            "lastMessageId": {"$first": "$_id"},
+            "lastSenderId": {"$first": "$senderId"},
+            "lastTimestamp": {"$first": "$timestamp"},
+            "unreadReceivers": {"$push": {"$cond": [{"$eq": ["$read", False]}, "$receiverId", "$$REMOVE"]}}
+        }}
+    ]
+    operations = []
+    async for row in db.messages.aggregate(pipeline, allowDiskUse=True):
+        participants = row["_id"]
+        unread = {user_id: row["unreadReceivers"].count(user_id) for user_id in participants}
+        operations.append(UpdateOne(
+            {"_id": ":".join(participants)},
+            {"$set": {
+                "participants": participants,
+                "lastMessage": row["lastMessage"],
+                "lastMessageId": row["lastMessageId"],
+                "lastSenderId": row["lastSenderId"],
+                "lastTimestamp": row["lastTimestamp"],
+                "unread": unread
+            }},
+            upsert=True
+        ))
+        if len(operations) >= BATCH_SIZE:
+            operations = await _flush(db.conversations, operations)
+    await _flush(db.conversations, operations)
+
+async def migrate_unread_notifications(db):
+    """Recompute the unreadNotifications counter from unread notifications"""
+    users = db.users
+    await users.update_many({}, {"$set": {"unreadNotifications": 0}})
+    operations = []
+    async for row in db.notifications.aggregate([
+        {"$match": {"read": False}},
+        {"$group": {"_id": "$userId", "count": {"$sum": 1}}}
+    ]):
+        operations.append(UpdateOne({"_id": _object_id(row["_id"])}, {"$set": {"unreadNotifications": row["count"]}}))
+        if len(operations) >= BATCH_SIZE:
+            operations = await _flush(users, operations)
+    await _flush(users, operations)
+
+async def migrate_unread_messages(db):
+    """Recompute the unreadMessages counter from unread messages"""
+    users = db.users
+    await users.update_many({}, {"$set": {"unreadMessages": 0}})
+    operations = []
+    async for row in db.messages.aggregate([
+        {"$match": {"read": False}},
+        {"$group": {"_id": "$receiverId", "count": {"$sum": 1}}}
+    ]):
+        operations.append(UpdateOne({"_id": _object_id(row["_id"])}, {"$set": {"unreadMessages": row["count"]}}))
+        if len(operations) >= BATCH_SIZE:
+            operations = await _flush(users, operations)
+    await _flush(users, operations)
+
+async def migrate_story_expiry(db):
+    """Give stories and story views missing expiresAt one, so the TTL indexes remove them"""
+    from stories import STORY_TTL
+    ttl_ms = int(STORY_TTL.total_seconds() * 1000)
+    for collection in (db.stories, db.story_views):
+        result = await collection.update_many(
+            {"expiresAt": {"$exists": False}},
+            [{"$set": {"expiresAt": {"$add": ["$timestamp", ttl_ms]}}}]
+        )
+        logger.info(f"Set expiresAt on {result.modified_count} {collection.name}")
+
+async def migrate_story_view_duplicates(db):
+    """
+    Delete duplicate (storyId, userId) story views left by the old find-then-insert,
+    keeping the earliest, then build the unique index that makes recording idempotent
+    """
+    from indexes import INDEXES
+
+    duplicates = []
+    async for row in db.story_views.aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": {"storyId": "$storyId", "userId": "$userId"}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True):
+        duplicates.extend(row["ids"][1:])
+        if len(duplicates) >= BATCH_SIZE:
+            await db.story_views.delete_many({"_id": {"$in": duplicates}})
+            duplicates = []
+    if duplicates:
+        await db.story_views.delete_many({"_id": {"$in": duplicates}})
+    await db.story_views.create_indexes(INDEXES["story_views"])
+
+async def migrate_story_view_counts(db):
+    """Recompute viewCount on active stories from story_views"""
+    operations = []
+    async for row in db.story_views.aggregate([{"$group": {"_id": "$storyId", "count": {"$sum": 1}}}]):
+        operations.append(UpdateOne({"_id": _object_id(row["_id"])}, {"$set": {"viewCount": row["count"]}}))
+        if len(operations) >= BATCH_SIZE:
+            operations = await _flush(db.stories, operations)
+    await _flush(db.stories, operations)
+
+async def migrate_posts_count(db):
+    """Recompute the postsCount counter shown on profiles"""
+    users = db.users
+    await users.update_many({}, {"$set": {"postsCount": 0}})
+    operations = []
+    async for row in db.posts.aggregate([{"$group": {"_id": "$userId", "count": {"$sum": 1}}}]):
+        operations.append(UpdateOne({"_id": _object_id(row["_id"])}, {"$set": {"postsCount": row["count"]}}))
+        if len(operations) >= BATCH_SIZE:
+            operations = await _flush(users, operations)
+    await _flush(users, operations)
+
+STEPS = {
+    "follows": migrate_follows,
+    "likes": migrate_likes,
+    "comments": migrate_comments,
+    "search_keys": migrate_search_keys,
+    "conversations": migrate_conversations,
+    "unread_notifications": migrate_unread_notifications,
+    "unread_messages": migrate_unread_messages,
+    "story_expiry": migrate_story_expiry,
+    "story_view_duplicates": migrate_story_view_duplicates,
+    "story_view_counts": migrate_story_view_counts,
+    "posts_count": migrate_posts_count,
+}
+
+async def main(step_names) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        for name in step_names or STEPS:
+            logger.info(f"Running migration step: {name}")
+            await STEPS[name](db)
+        return 0
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run data migrations")
+    parser.add_argument("steps", nargs="*", help=f"steps to run: {', '.join(STEPS)} (default: all)")
+    args = parser.parse_args()
+    unknown = [name for name in args.steps if name not in STEPS]
+    if unknown:
+        parser.error(f"unknown steps: {', '.join(unknown)}")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(main(args.steps)))
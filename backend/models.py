@@ -41,8 +41,12 @@ class UserInDB(BaseModel):
     password_hash: str
     profilePicture: Optional[str] = None
     bio: str = ""
-    followers: List[str] = []
-    following: List[str] = []
+    followersCount: int = 0
+    followingCount: int = 0
+    unreadNotifications: int = 0
+    unreadMessages: int = 0
+    postsCount: int = 0
+    version: int = 0
     createdAt: datetime = Field(default_factory=datetime.utcnow)
 
     class Config:
@@ -83,7 +87,8 @@ class PostResponse(BaseModel):
     caption: str
     likes: int
     liked: bool = False
-    comments: List[CommentResponse] = []
+    comments: List[CommentResponse] = []  # Preview of the latest comments
+    commentCount: int = 0
     timestamp: datetime
 
 class PostInDB(BaseModel):
@@ -91,8 +96,9 @@ class PostInDB(BaseModel):
     userId: str
     imageUrl: str
     caption: str
-    likes: List[str] = []  # List of user IDs who liked
-    comments: List[dict] = []
+    likeCount: int = 0  # Likes are stored in the post_likes collection
+    commentCount: int = 0  # Comments are stored in the comments collection
+    latestComments: List[dict] = []
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
     class Config:
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from counters import decrement_user_counter
+from pagination import decode_cursor
+
+logger = logging.getLogger(__name__)
+
+# Notifications are written behind the request by NotificationBatcher.
+# Likes on the same post within one window collapse into a single unread document:
+# {userId, type, postId, window, actorId (latest), actorIds (latest first), actorCount, ...}
+NOTIFICATION_FLUSH_SECONDS = float(os.environ.get('NOTIFICATION_FLUSH_SECONDS', '0.5'))
+NOTIFICATION_BATCH_SIZE = 500
+# Notifications emitted while this many are already waiting are dropped
+NOTIFICATION_QUEUE_LIMIT = int(os.environ.get('NOTIFICATION_QUEUE_LIMIT', '10000'))
+NOTIFICATION_COLLAPSE_WINDOW = timedelta(hours=1)
+COLLAPSIBLE_TYPES = {"like"}
+# Message shown when a collapsed notification has more than one actor
+COLLAPSED_MESSAGES = {"like": "curtiram sua foto"}
+MAX_ACTOR_IDS = 10
+
+def collapse_window(timestamp: datetime) -> int:
+    return int(timestamp.timestamp() // NOTIFICATION_COLLAPSE_WINDOW.total_seconds())
+
+def notification_message(notification: dict) -> str:
+    if notification.get("actorCount", 1) > 1:
+        return COLLAPSED_MESSAGES.get(notification["type"], notification.get("message", ""))
+    return notification.get("message", "")
+
+def _merge_actors(actor_ids: List[str]) -> dict:
+    """
+    Pipeline $set fields putting actor_ids first in actorIds and counting only actors not
+    already listed, so liking again after an unlike does not count the same user twice.
+    An actor who has already fallen off the end of actorIds is counted again.
+    """
+    new_ids = {"$literal": actor_ids}
+    current = {"$ifNull": ["$actorIds", []]}
+
+    def missing_from(ids, other):
+        return {"$filter": {"input": ids, "as": "id", "cond": {"$eq": [{"$in": ["$$id", other]}, False]}}}
+
+    return {
+        "actorIds": {"$slice": [{"$concatArrays": [new_ids, missing_from(current, new_ids)]}, MAX_ACTOR_IDS]},
+        "actorCount": {"$add": [{"$ifNull": ["$actorCount", 0]}, {"$size": missing_from(new_ids, current)}]}
+    }
+
+async def mark_notifications_read(notifications_collection, users_collection, user_id: str,
+                                  ids: Optional[List[str]] = None, before: Optional[str] = None) -> int:
+    """
+    Mark the given notifications, or every notification at or older than the `before`
+    cursor, as read with one update_many; returns how many changed
+    """
+    query = {"userId": user_id, "read": False}
+    if ids is not None:
+        query["_id"] = {"$in": [ObjectId(notification_id) for notification_id in ids if ObjectId.is_valid(notification_id)]}
+    elif before:
+        timestamp, object_id = decode_cursor(before)
+        query["$or"] = [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lte": object_id}}
+        ]
+    result = await notifications_collection.update_many(query, {"$set": {"read": True}})
+    await decrement_user_counter(users_collection, user_id, "unreadNotifications", result.modified_count)
+    return result.modified_count
+
+class NotificationBatcher:
+    """
+    Collects notifications emitted by request handlers and writes them in batches:
+    one insert_many for plain notifications, one bulk_write of upserts for collapsed
+    ones and one bulk_write bumping each recipient's unreadNotifications counter.
+    Events are published to recipients after each flush.
+    """
+    def __init__(self, notifications_collection, users_collection, event_bus):
+        self.notifications = notifications_collection
+        self.users = users_collection
+        self.event_bus = event_bus
+        self._pending: List[dict] = []
+        self._wakeup = asyncio.Event()
+        self._writing: Optional[asyncio.Future] = None
+        self._stats = {"pending": 0, "written": 0, "collapsed": 0, "dropped": 0}
+
+    def emit(self, user_id: str, actor_id: str, notif_type: str, message: str,
+             post_id: str = None, post_image: str = None):
+        """Queue a notification; returns immediately"""
+        if user_id == actor_id:  # Don't notify yourself
+            return
+        if len(self._pending) >= NOTIFICATION_QUEUE_LIMIT:
+            self._stats["dropped"] += 1
+            logger.warning(f"Notification queue full, dropping {notif_type} for {user_id}")
+            return
+        self._pending.append({
+            "userId": user_id,
+            "actorId": actor_id,
+            "type": notif_type,
+            "message": message,
+            "postId": post_id,
+            "postImage": post_image,
+            "timestamp": datetime.utcnow(),
+            "read": False
+        })
+        self._wakeup.set()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self._stats, "pending": len(self._pending)}
+
+    async def run(self):
+        """Flush shortly after notifications arrive, so bursts share a batch, until cancelled"""
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(NOTIFICATION_FLUSH_SECONDS)
+            await self.flush()
+
+    async def stop(self):
+        """Finish the in-flight write and flush whatever is still queued"""
+        if self._writing:
+            await asyncio.gather(self._writing, return_exceptions=True)
+        await self.flush()
+
+    async def flush(self):
+        self._wakeup.clear()
+        while self._pending:
+            batch = self._pending[:NOTIFICATION_BATCH_SIZE]
+            del self._pending[:NOTIFICATION_BATCH_SIZE]
+            # Shielded so a cancelled worker does not lose a batch halfway through
+            self._writing = asyncio.ensure_future(self._write(batch))
+            try:
+                await asyncio.shield(self._writing)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} notifications: {str(e)}")
+
+    async def _write(self, batch: List[dict]):
+        plain = []
+        collapsed: Dict[tuple, dict] = {}
+        for notification in batch:
+            if notification["type"] not in COLLAPSIBLE_TYPES or not notification["postId"]:
+                plain.append(notification)
+                continue
+            window = collapse_window(notification["timestamp"])
+            key = (notification["userId"], notification["postId"], notification["type"], window)
+            group = collapsed.setdefault(key, {"latest": notification, "actorIds": []})
+            group["latest"] = notification
+            if notification["actorId"] not in group["actorIds"]:
+                group["actorIds"].insert(0, notification["actorId"])
+
+        new_unread = defaultdict(int)
+        published = []
+
+        if plain:
+            await self.notifications.insert_many(plain, ordered=False)
+            for notification in plain:
+                new_unread[notification["userId"]] += 1
+                published.append(notification)
+
+        if collapsed:
+            groups = list(collapsed.items())
+            result = await self.notifications.bulk_write([
+                UpdateOne(
+                    {"userId": user_id, "postId": post_id, "type": notif_type, "window": window, "read": False},
+                    [{"$set": {
+                        "actorId": group["latest"]["actorId"],
+                        "message": group["latest"]["message"],
+                        "postImage": group["latest"]["postImage"],
+                        "timestamp": group["latest"]["timestamp"],
+                        **_merge_actors(group["actorIds"])
+                    }}],
+                    upsert=True
+                )
+                for (user_id, post_id, notif_type, window), group in groups
+            ], ordered=False)
+            upserted = result.upserted_ids
+            for index, ((user_id, _, _, _), group) in enumerate(groups):
+                # Only a newly created document adds to the unread badge
+                if index in upserted:
+                    new_unread[user_id] += 1
+                published.append({**group["latest"], "_id": upserted.get(index)})
+            self._stats["collapsed"] += len(batch) - len(plain) - len(groups)
+
+        if new_unread:
+            await self.users.bulk_write([
+                UpdateOne({"_id": ObjectId(user_id)}, {"$inc": {"unreadNotifications": count}})
+                for user_id, count in new_unread.items() if ObjectId.is_valid(user_id)
+            ], ordered=False)
+        self._stats["written"] += len(batch)
+
+        for notification in published:
+            await self.event_bus.publish(notification["userId"], {
+                "type": "notification",
+                "notification": {
+                    "id": str(notification["_id"]) if notification.get("_id") else None,
+                    "type": notification["type"],
+                    "actorId": notification["actorId"],
+                    "message": notification["message"],
+                    "postId": notification["postId"],
+                    "postImage": notification["postImage"],
+                    "timestamp": notification["timestamp"].isoformat(),
+                    "read": False
+                }
+            })
@@ -0,0 +1,76 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+from bson import ObjectId
+from fastapi import HTTPException
+
+# Newest first, with _id as a tie-breaker so documents sharing a timestamp keep a stable order
+NEWEST_FIRST = [("timestamp", -1), ("_id", -1)]
+
+def encode_cursor(value, object_id) -> str:
+    """
+    Build an opaque cursor from the sort key of the last document on a page
+    """
+    if isinstance(value, datetime):
+        key = {"t": value.isoformat()}
+    else:
+        key = {"v": value}
+    if isinstance(object_id, ObjectId):
+        key["id"] = str(object_id)
+    else:
+        key["sid"] = object_id
+    raw = json.dumps(key, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, value_type: type = datetime, id_type: type = ObjectId) -> Tuple[object, object]:
+    """
+    Decode a cursor produced by encode_cursor into (sort value, _id), rejecting cursors
+    whose value or _id is not of the type the paged field holds (naive datetimes, ints, ...)
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = datetime.fromisoformat(key["t"]) if "t" in key else key["v"]
+        object_id = ObjectId(key["id"]) if "id" in key else key["sid"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if type(value) is not value_type or type(object_id) is not id_type or getattr(value, "tzinfo", None):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, object_id
+
+def keyset_filter(cursor: Optional[str], field: str = "timestamp",
+                  value_type: type = datetime, id_type: type = ObjectId) -> dict:
+    """
+    Filter matching documents that come after the cursor in (field desc, _id desc) order
+    """
+    if not cursor:
+        return {}
+    value, object_id = decode_cursor(cursor, value_type, id_type)
+    return {
+        "$or": [
+            {field: {"$lt": value}},
+            {field: value, "_id": {"$lt": object_id}}
+        ]
+    }
+
+def next_cursor(docs: List[dict], limit: int, field: str = "timestamp") -> Optional[str]:
+    """
+    Cursor pointing past the last document, or None when the page was not full
+    """
+    if len(docs) < limit or not docs:
+        return None
+    last = docs[-1]
+    return encode_cursor(last[field], last["_id"])
+
+def with_cursor(query: dict, cursor: Optional[str], field: str = "timestamp",
+                value_type: type = datetime, id_type: type = ObjectId) -> dict:
+    """
+    Combine a route's filter with the keyset filter for the given cursor
+    """
+    after = keyset_filter(cursor, field, value_type, id_type)
+    if not after:
+        return query
+    if not query:
+        return after
+    return {"$and": [query, after]}
@@ -0,0 +1,53 @@
+import hashlib
+import os
+from typing import Optional
+
+from bson import ObjectId
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional; list endpoints fall back to the standard encoder
+    orjson = None
+
+# List endpoints return json_response(...) to skip FastAPI's jsonable_encoder walk and
+# serialize straight from dicts with orjson, which handles datetime natively.
+# FAST_JSON_RESPONSES=0 switches them back to the standard path.
+FAST_JSON_ENABLED = orjson is not None and os.environ.get('FAST_JSON_RESPONSES', '1') == '1'
+
+# Per-user responses may be stored by the browser but must be revalidated with the ETag
+PRIVATE_CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson; content must be plain dicts/lists/str/numbers/datetimes"""
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default)
+
+def json_response(content, status_code: int = 200, etag: Optional[str] = None) -> JSONResponse:
+    """Response for a route's return value, through orjson when available and enabled"""
+    headers = {"ETag": etag, **PRIVATE_CACHE_HEADERS} if etag else None
+    if FAST_JSON_ENABLED:
+        return FastJSONResponse(content, status_code=status_code, headers=headers)
+    return JSONResponse(jsonable_encoder(content), status_code=status_code, headers=headers)
+
+def make_etag(*parts) -> str:
+    """Weak ETag from the values a response is built from (ids, counters, versions, timestamps)"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response when the request's If-None-Match already has etag, else None"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    if "*" not in tags and etag.removeprefix("W/") not in tags:
+        return None
+    return Response(status_code=304, headers={"ETag": etag, **PRIVATE_CACHE_HEADERS})
@@ -0,0 +1,56 @@
+import os
+import re
+import unicodedata
+from typing import List, Optional
+
+from bson import ObjectId
+
+from pagination import with_cursor
+
+# Users are matched on lowercase, accent-free prefixes of their username, their full
+# name and each word of the full name, stored in `searchKeys`, and ranked by follower count.
+# An anchored regex on searchKeys is an index range scan, but a range on the first key cannot
+# provide the followersCount order: MongoDB would fetch and sort every match, a large part of
+# the collection for a one or two letter prefix. So at most SEARCH_CANDIDATE_LIMIT matches are
+# ranked per page: exact for most prefixes, an approximation for very broad ones.
+SEARCH_SORT = [("followersCount", -1), ("_id", -1)]
+SEARCH_CANDIDATE_LIMIT = int(os.environ.get('SEARCH_CANDIDATE_LIMIT', '1000'))
+MAX_QUERY_LENGTH = 50
+
+def normalize(text: str) -> str:
+    """Lowercase and strip accents, e.g. 'João' -> 'joao'"""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower().strip()
+
+def build_search_keys(username: str, full_name: str) -> List[str]:
+    """Keys stored on the user document for prefix search"""
+    name = " ".join(normalize(full_name).split())
+    keys = {normalize(username), name, *name.split()}
+    keys.discard("")
+    return sorted(keys)
+
+def _prefix(q: str) -> str:
+    return " ".join(normalize(q[:MAX_QUERY_LENGTH]).split())
+
+def search_query(q: str, exclude_user_id: Optional[str] = None, cursor: Optional[str] = None) -> dict:
+    """Filter for users whose username or name starts with q (escaped, case and accent insensitive)"""
+    query = {}
+    prefix = _prefix(q)
+    if prefix:
+        query["searchKeys"] = {"$regex": "^" + re.escape(prefix)}
+    if exclude_user_id and ObjectId.is_valid(exclude_user_id):
+        query["_id"] = {"$ne": ObjectId(exclude_user_id)}
+    return with_cursor(query, cursor, "followersCount", int)
+
+def search_pipeline(q: str, limit: int, projection: dict,
+                    exclude_user_id: Optional[str] = None, cursor: Optional[str] = None) -> list:
+    """
+    One page of search results, most followed first. With a prefix, the matches are cut to
+    SEARCH_CANDIDATE_LIMIT (in index order) before sorting; without one the followersCount
+    index provides the order.
+    """
+    pipeline = [{"$match": search_query(q, exclude_user_id, cursor)}]
+    if _prefix(q):
+        pipeline.append({"$limit": SEARCH_CANDIDATE_LIMIT})
+    pipeline += [{"$sort": dict(SEARCH_SORT)}, {"$limit": limit}, {"$project": projection}]
+    return pipeline
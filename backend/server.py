@@ -1,14 +1,21 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, File, UploadFile, Form
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, File, UploadFile, Form, Header, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer
+from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import json
+import asyncio
+import secrets
 import logging
 from pathlib import Path
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 # IMPORTANT: Load environment variables FIRST before importing other modules
 ROOT_DIR = Path(__file__).parent
@@ -20,10 +27,32 @@ from models import (
     StoryResponse, StoryGroupResponse
 )
 from auth import (
-    hash_password, verify_password, create_access_token, 
-    get_current_user_id, security
+    hash_password_async, verify_password_async, create_access_token, create_stream_token,
+    get_current_user_id, get_stream_user_id, get_password_hashing_stats, security, STREAM_TOKEN_SECONDS
+)
+from media import thumbnail_url, upload_media
+from media_gc import enqueue_media_deletion, run_media_garbage_worker
+from storage import LocalMediaStorage, get_media_storage
+from hydration import card_epoch, fetch_user_cards, invalidate_user_card, user_card_cache
+from viewer import SELF_PROFILE_FIELDS, CurrentUserLoader, invalidate_viewer, viewer_cache
+from pagination import NEWEST_FIRST, encode_cursor, next_cursor, with_cursor
+from responses import json_response, make_etag, not_modified
+from indexes import ensure_indexes
+from timeline import FEED_TIMELINE_ENABLED, TimelineEngine
+from follows import add_follow, remove_follow, get_following_ids, get_followed_subset, get_follow_page, is_following
+from likes import add_like, remove_like, get_liked_subset
+from comments import add_comment as store_comment, format_comment
+from search import build_search_keys, search_pipeline
+from suggestions import get_suggestions, run_suggestions_refresher
+from conversations import INBOX_SORT, record_message, mark_messages_read, other_participant
+from counters import get_unread_counts, increment_user_counters
+from events import create_event_bus
+from stories import STORY_TTL, record_story_views, story_tray_pipeline, story_tray_version
+from notifications import NotificationBatcher, mark_notifications_read, notification_message
+from sharing import (
+    MAX_SHARE_RECIPIENTS, SHARE_INLINE_LIMIT, dedupe_recipients, enqueue_share,
+    format_share_message, run_share_worker, share_with_recipients
 )
-from cloudinary_config import upload_image_to_cloudinary, delete_image_from_cloudinary
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
@@ -34,6 +63,22 @@ db = client[os.environ['DB_NAME']]
 users_collection = db.users
 posts_collection = db.posts
 stories_collection = db.stories
+media_garbage_collection = db.media_garbage
+timelines_collection = db.timelines
+follows_collection = db.follows
+post_likes_collection = db.post_likes
+comments_collection = db.comments
+user_suggestions_collection = db.user_suggestions
+
+event_bus = create_event_bus(db)
+
+timeline_engine = TimelineEngine(timelines_collection, posts_collection, users_collection, follows_collection)
+
+# Dependency loading only the listed fields of the authenticated user
+current_user = CurrentUserLoader(users_collection)
+
+# Largest page a client may request from the paginated list endpoints
+MAX_PAGE_SIZE = 100
 
 # Create the main app
 app = FastAPI()
@@ -60,11 +105,16 @@ async def register(user_data: UserRegister):
         "email": user_data.email,
         "username": user_data.username,
         "fullName": user_data.fullName,
-        "password_hash": hash_password(user_data.password),
+        "password_hash": await hash_password_async(user_data.password),
         "profilePicture": None,
         "bio": "",
-        "followers": [],
-        "following": [],
+        "searchKeys": build_search_keys(user_data.username, user_data.fullName),
+        "followersCount": 0,
+        "followingCount": 0,
+        "unreadNotifications": 0,
+        "unreadMessages": 0,
+        "postsCount": 0,
+        "version": 0,
         "createdAt": datetime.utcnow()
     }
     
@@ -97,13 +147,15 @@ async def login(credentials: UserLogin):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Verify password
-    if not verify_password(credentials.password, user["password_hash"]):
+    valid, new_hash = await verify_password_async(credentials.password, user["password_hash"])
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     user_id = str(user["_id"])
     
-    # Count posts
-    posts_count = await posts_collection.count_documents({"userId": user_id})
+    # Upgrade the stored hash if the bcrypt cost factor changed
+    if new_hash:
+        await users_collection.update_one({"_id": user["_id"]}, {"$set": {"password_hash": new_hash}})
     
     # Create JWT token
     token = create_access_token(user_id)
@@ -117,21 +169,20 @@ async def login(credentials: UserLogin):
             "fullName": user["fullName"],
             "profilePicture": user.get("profilePicture"),
             "bio": user.get("bio", ""),
-            "followers": len(user.get("followers", [])),
-            "following": len(user.get("following", [])),
-            "posts": posts_count
+            "followers": user.get("followersCount", 0),
+            "following": user.get("followingCount", 0),
+            "posts": user.get("postsCount", 0)
         }
     }
 
 @api_router.get("/auth/me")
-async def get_current_user(current_user_id: str = Depends(get_current_user_id)):
-    user = await users_collection.find_one({"_id": ObjectId(current_user_id)})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    posts_count = await posts_collection.count_documents({"userId": current_user_id})
+async def get_current_user(request: Request, user: dict = Depends(current_user(*SELF_PROFILE_FIELDS))):
+    etag = make_etag(user.get("version", 0), *(user.get(field) for field in SELF_PROFILE_FIELDS))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
     
-    return {
+    return json_response({
         "user": {
             "id": str(user["_id"]),
             "email": user["email"],
@@ -139,71 +190,218 @@ async def get_current_user(current_user_id: str = Depends(get_current_user_id)):
             "fullName": user["fullName"],
             "profilePicture": user.get("profilePicture"),
             "bio": user.get("bio", ""),
-            "followers": len(user.get("followers", [])),
-            "following": len(user.get("following", [])),
-            "posts": posts_count
+            "followers": user.get("followersCount", 0),
+            "following": user.get("followingCount", 0),
+            "posts": user.get("postsCount", 0)
         }
-    }
+    }, etag=etag)
 
 # ==================== USER ROUTES ====================
 
 @api_router.get("/users/search")
-async def search_users(q: str, current_user_id: str = Depends(get_current_user_id)):
-    # Search users by username or fullName
-    users = await users_collection.find({
-        "$or": [
-            {"username": {"$regex": q, "$options": "i"}},
-            {"fullName": {"$regex": q, "$options": "i"}}
-        ]
-    }).limit(20).to_list(20)
+async def search_users(
+    q: str = "",
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    # Search users by username or fullName prefix, most followed first
+    limit = min(limit, MAX_PAGE_SIZE)
+    users = await users_collection.aggregate(search_pipeline(
+        q, limit, {"username": 1, "fullName": 1, "profilePicture": 1, "followersCount": 1},
+        exclude_user_id=current_user_id, cursor=cursor
+    )).to_list(limit)
     
-    # Get current user's following list
-    current_user = await users_collection.find_one({"_id": ObjectId(current_user_id)})
-    following_list = current_user.get("following", [])
+    # Check which of these users the current user follows in one query
+    following = await get_followed_subset(follows_collection, current_user_id, (str(user["_id"]) for user in users))
     
     result = []
     for user in users:
         user_id = str(user["_id"])
-        if user_id != current_user_id:  # Don't include current user
+        result.append({
+            "id": user_id,
+            "username": user["username"],
+            "fullName": user["fullName"],
+            "profilePicture": user.get("profilePicture"),
+            "followers": user.get("followersCount", 0),
+            "isFollowing": user_id in following
+        })
+    
+    return json_response({"users": result, "nextCursor": next_cursor(users, limit, "followersCount")})
+
+@api_router.get("/users/suggestions")
+async def get_user_suggestions(current_user_id: str = Depends(get_current_user_id)):
+    """Suggested users, precomputed from friends-of-friends"""
+    suggested_ids = await get_suggestions(
+        user_suggestions_collection, follows_collection, users_collection, current_user_id
+    )
+    
+    users = await users_collection.find(
+        {"_id": {"$in": [ObjectId(user_id) for user_id in suggested_ids]}},
+        {"username": 1, "fullName": 1, "profilePicture": 1, "followersCount": 1}
+    ).to_list(len(suggested_ids))
+    users_by_id = {str(user["_id"]): user for user in users}
+    
+    # The list may be a few hours old; drop anyone followed since it was computed
+    following = await get_followed_subset(follows_collection, current_user_id, users_by_id.keys())
+    
+    result = []
+    for user_id in suggested_ids:
+        user = users_by_id.get(user_id)
+        if user and user_id not in following:
             result.append({
                 "id": user_id,
                 "username": user["username"],
                 "fullName": user["fullName"],
                 "profilePicture": user.get("profilePicture"),
-                "followers": len(user.get("followers", [])),
-                "isFollowing": user_id in following_list
+                "followers": user.get("followersCount", 0),
+                "isFollowing": False
             })
     
     return {"users": result}
 
+@api_router.get("/users/{id_or_username}")
+async def get_user_profile(id_or_username: str, current_user_id: str = Depends(get_current_user_id)):
+    """Get a user's public profile by id or username"""
+    projection = {
+        "username": 1, "fullName": 1, "profilePicture": 1, "bio": 1,
+        "followersCount": 1, "followingCount": 1, "postsCount": 1
+    }
+    user = None
+    if ObjectId.is_valid(id_or_username):
+        user = await users_collection.find_one({"_id": ObjectId(id_or_username)}, projection)
+    if not user:
+        user = await users_collection.find_one({"username": id_or_username}, projection)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    user_id = str(user["_id"])
+    
+    return {
+        "user": {
+            "id": user_id,
+            "username": user["username"],
+            "fullName": user["fullName"],
+            "profilePicture": user.get("profilePicture"),
+            "bio": user.get("bio", ""),
+            "followers": user.get("followersCount", 0),
+            "following": user.get("followingCount", 0),
+            "posts": user.get("postsCount", 0),
+            "isFollowing": user_id != current_user_id and await is_following(follows_collection, current_user_id, user_id)
+        }
+    }
+
+@api_router.get("/users/{user_id}/posts")
+async def get_user_posts(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = 24,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """A user's posts for the profile grid, newest first: thumbnail and counters only"""
+    limit = min(limit, MAX_PAGE_SIZE)
+    posts = await posts_collection.find(
+        with_cursor({"userId": user_id}, cursor),
+        {"imageUrl": 1, "likeCount": 1, "commentCount": 1, "timestamp": 1}
+    ).sort(NEWEST_FIRST).limit(limit).to_list(limit)
+    
+    result = []
+    for post in posts:
+        result.append({
+            "id": str(post["_id"]),
+            "imageUrl": post["imageUrl"],
+            "thumbnailUrl": thumbnail_url(post["imageUrl"]),
+            "likes": post.get("likeCount", 0),
+            "commentCount": post.get("commentCount", 0),
+            "timestamp": post["timestamp"]
+        })
+    
+    return json_response({"posts": result, "nextCursor": next_cursor(posts, limit)})
+
+async def list_follows(list_name: str, user_id: str, cursor: Optional[str], limit: int, current_user_id: str):
+    """A page of followers/following hydrated with one $in query and annotated with the viewer's follow state"""
+    limit = min(limit, MAX_PAGE_SIZE)
+    user_ids, page_cursor = await get_follow_page(follows_collection, user_id, list_name, cursor, limit)
+    
+    users = await users_collection.find(
+        {"_id": {"$in": [ObjectId(uid) for uid in user_ids if ObjectId.is_valid(uid)]}},
+        {"username": 1, "fullName": 1, "profilePicture": 1}
+    ).to_list(len(user_ids))
+    users_by_id = {str(user["_id"]): user for user in users}
+    
+    following = await get_followed_subset(follows_collection, current_user_id, users_by_id.keys())
+    
+    result = []
+    for uid in user_ids:
+        user = users_by_id.get(uid)
+        if user:
+            result.append({
+                "id": uid,
+                "username": user["username"],
+                "fullName": user.get("fullName", ""),
+                "profilePicture": user.get("profilePicture"),
+                "isFollowing": uid in following
+            })
+    
+    return json_response({"users": result, "nextCursor": page_cursor})
+
+@api_router.get("/users/{user_id}/followers")
+async def get_followers(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Users following user_id, most recent first"""
+    return await list_follows("followers", user_id, cursor, limit, current_user_id)
+
+@api_router.get("/users/{user_id}/following")
+async def get_following(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Users user_id follows, most recent first"""
+    return await list_follows("following", user_id, cursor, limit, current_user_id)
+
 @api_router.put("/users/profile")
 async def update_profile(
     fullName: Optional[str] = Form(None),
     bio: Optional[str] = Form(None),
     profilePicture: Optional[UploadFile] = File(None),
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    viewer: dict = Depends(current_user("username"))
 ):
     update_data = {}
     
     if fullName:
         update_data["fullName"] = fullName
+        # Keep the search keys in sync with the name
+        update_data["searchKeys"] = build_search_keys(viewer["username"], fullName)
     if bio is not None:
         update_data["bio"] = bio
     
     # Upload profile picture if provided
     if profilePicture:
-        image_url = await upload_image_to_cloudinary(profilePicture, "instaclone/profiles")
+        image_url = await upload_media(profilePicture, "instaclone/profiles")
         update_data["profilePicture"] = image_url
     
-    # Update user
-    await users_collection.update_one(
+    # Update user and return the new version of the fields shown on the profile
+    update = {"$inc": {"version": 1}}
+    if update_data:
+        update["$set"] = update_data
+    user = await users_collection.find_one_and_update(
         {"_id": ObjectId(current_user_id)},
-        {"$set": update_data}
+        update,
+        projection={field: 1 for field in SELF_PROFILE_FIELDS},
+        return_document=ReturnDocument.AFTER
     )
-    
-    # Get updated user
-    user = await users_collection.find_one({"_id": ObjectId(current_user_id)})
-    posts_count = await posts_collection.count_documents({"userId": current_user_id})
+    if not user:
+        raise HTTPException(status_code=401, detail="User no longer exists")
+    await invalidate_viewer(current_user_id)
+    if "profilePicture" in update_data:
+        await invalidate_user_card(current_user_id)
     
     return {
         "user": {
@@ -213,9 +411,9 @@ async def update_profile(
             "fullName": user["fullName"],
             "profilePicture": user.get("profilePicture"),
             "bio": user.get("bio", ""),
-            "followers": len(user.get("followers", [])),
-            "following": len(user.get("following", [])),
-            "posts": posts_count
+            "followers": user.get("followersCount", 0),
+            "following": user.get("followingCount", 0),
+            "posts": user.get("postsCount", 0)
         }
     }
 
@@ -224,41 +422,30 @@ async def follow_user(user_id: str, current_user_id: str = Depends(get_current_u
     if user_id == current_user_id:
         raise HTTPException(status_code=400, detail="Cannot follow yourself")
     
-    # Add to current user's following list
-    await users_collection.update_one(
-        {"_id": ObjectId(current_user_id)},
-        {"$addToSet": {"following": user_id}}
-    )
-    
-    # Add to target user's followers list
-    await users_collection.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$addToSet": {"followers": current_user_id}}
-    )
+    if not ObjectId.is_valid(user_id) or not await users_collection.find_one({"_id": ObjectId(user_id)}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="User not found")
     
-    # Create notification
-    await create_notification(
-        user_id=user_id,
-        actor_id=current_user_id,
-        notif_type="follow",
-        message="começou a seguir você"
-    )
+    # Create the follow edge; already following is a no-op
+    if await add_follow(follows_collection, users_collection, current_user_id, user_id):
+        if FEED_TIMELINE_ENABLED:
+            await timeline_engine.add_followee(current_user_id, user_id)
+        
+        # Create notification
+        notification_batcher.emit(
+            user_id=user_id,
+            actor_id=current_user_id,
+            notif_type="follow",
+            message="começou a seguir você"
+        )
     
     return {"message": "Following user", "isFollowing": True}
 
 @api_router.delete("/users/{user_id}/follow")
 async def unfollow_user(user_id: str, current_user_id: str = Depends(get_current_user_id)):
-    # Remove from current user's following list
-    await users_collection.update_one(
-        {"_id": ObjectId(current_user_id)},
-        {"$pull": {"following": user_id}}
-    )
-    
-    # Remove from target user's followers list
-    await users_collection.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$pull": {"followers": current_user_id}}
-    )
+    # Delete the follow edge
+    if await remove_follow(follows_collection, users_collection, current_user_id, user_id):
+        if FEED_TIMELINE_ENABLED:
+            await timeline_engine.remove_followee(current_user_id, user_id)
     
     return {"message": "Unfollowed user", "isFollowing": False}
 
@@ -266,40 +453,69 @@ async def unfollow_user(user_id: str, current_user_id: str = Depends(get_current
 
 @api_router.get("/posts/feed")
 async def get_feed(
+    request: Request,
     page: int = 1,
     limit: int = 10,
-    current_user_id: str = Depends(get_current_user_id)
+    cursor: Optional[str] = None,
+    current_user_id: str = Depends(get_current_user_id),
+    viewer: dict = Depends(current_user("followingCount"))
 ):
-    # Get current user's following list
-    current_user = await users_collection.find_one({"_id": ObjectId(current_user_id)})
-    following_list = current_user.get("following", [])
-    following_list.append(current_user_id)  # Include own posts
-    
-    # If not following anyone, show all posts (discovery mode)
-    skip = (page - 1) * limit
-    if len(following_list) <= 1:  # Only has self
-        posts = await posts_collection.find().sort("timestamp", -1).skip(skip).limit(limit).to_list(limit)
-    else:
-        # Get posts from following users
+    limit = min(limit, MAX_PAGE_SIZE)
+    following_anyone = viewer.get("followingCount", 0) > 0
+    
+    # Keyset pagination when a cursor is given, legacy page/skip otherwise
+    skip = 0 if cursor else (page - 1) * limit
+    
+    # Read the precomputed home timeline when following someone
+    posts = None
+    if FEED_TIMELINE_ENABLED and following_anyone:
+        entries = await timeline_engine.read(current_user_id, cursor, skip, limit)
+        if entries is not None:
+            found = await posts_collection.find(
+                {"_id": {"$in": [entry["_id"] for entry in entries]}}
+            ).to_list(len(entries))
+            found_by_id = {post["_id"]: post for post in found}
+            # Keep timeline order; deleted posts simply drop out of the page
+            posts = [found_by_id[entry["_id"]] for entry in entries if entry["_id"] in found_by_id]
+            page_keys = entries
+    
+    if posts is None:
+        # If not following anyone, show all posts (discovery mode)
+        if not following_anyone:
+            query = {}
+        else:
+            # Get posts from following users, including own posts
+            following_list = await get_following_ids(follows_collection, current_user_id)
+            following_list.append(current_user_id)
+            query = {"userId": {"$in": following_list}}
+        
         posts = await posts_collection.find(
-            {"userId": {"$in": following_list}}
-        ).sort("timestamp", -1).skip(skip).limit(limit).to_list(limit)
+            with_cursor(query, cursor)
+        ).sort(NEWEST_FIRST).skip(skip).limit(limit).to_list(limit)
+        page_keys = posts
+    
+    # Check which posts the current user liked in one query
+    liked = await get_liked_subset(post_likes_collection, current_user_id, (str(post["_id"]) for post in posts))
+    
+    # The first page is what clients refetch on every visit; revalidate it from the
+    # posts and the viewer's likes before hydrating authors
+    etag = None
+    if not cursor and page == 1:
+        etag = make_etag(card_epoch(), sorted(liked), [
+            (post["_id"], post.get("likeCount", 0), post.get("commentCount", 0)) for post in posts
+        ])
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+    
+    # Get all post authors in one query
+    authors = await fetch_user_cards(users_collection, (post["userId"] for post in posts))
     
     result = []
     for post in posts:
-        # Get post author info
-        author = await users_collection.find_one({"_id": ObjectId(post["userId"])})
-        
-        # Format comments
-        formatted_comments = []
-        for comment in post.get("comments", []):
-            formatted_comments.append({
-                "id": comment["id"],
-                "userId": comment["userId"],
-                "username": comment["username"],
-                "text": comment["text"],
-                "timestamp": comment["timestamp"]
-            })
+        author = authors.get(post["userId"])
+        if not author:
+            continue
         
         result.append({
             "id": str(post["_id"]),
@@ -308,61 +524,82 @@ async def get_feed(
             "userProfilePicture": author.get("profilePicture"),
             "imageUrl": post["imageUrl"],
             "caption": post["caption"],
-            "likes": len(post.get("likes", [])),
-            "liked": current_user_id in post.get("likes", []),
-            "comments": formatted_comments,
+            "likes": post.get("likeCount", 0),
+            "liked": str(post["_id"]) in liked,
+            # Only a preview of the latest comments; the rest is paged from /posts/{id}/comments
+            "comments": [format_comment(comment) for comment in post.get("latestComments", [])],
+            "commentCount": post.get("commentCount", 0),
             "timestamp": post["timestamp"]
         })
     
-    return {"posts": result, "hasMore": len(posts) == limit}
+    return json_response(
+        {"posts": result, "hasMore": len(page_keys) == limit, "nextCursor": next_cursor(page_keys, limit)},
+        etag=etag
+    )
 
 @api_router.post("/posts")
 async def create_post(
     caption: str = Form(...),
     image: UploadFile = File(...),
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    viewer: dict = Depends(current_user("username", "profilePicture"))
 ):
-    # Upload image to Cloudinary
-    image_url = await upload_image_to_cloudinary(image, "instaclone/posts")
+    # Upload image
+    image_url = await upload_media(image, "instaclone/posts")
     
     # Create post
     post_dict = {
         "userId": current_user_id,
         "imageUrl": image_url,
         "caption": caption,
-        "likes": [],
-        "comments": [],
+        "likeCount": 0,
+        "commentCount": 0,
+        "latestComments": [],
         "timestamp": datetime.utcnow()
     }
     
     result = await posts_collection.insert_one(post_dict)
     
-    # Get user info
-    user = await users_collection.find_one({"_id": ObjectId(current_user_id)})
+    # Count the post on the profile
+    user = await users_collection.find_one_and_update(
+        {"_id": ObjectId(current_user_id)},
+        {"$inc": {"postsCount": 1}},
+        projection={"followersCount": 1, "celebrity": 1},
+        return_document=ReturnDocument.AFTER
+    ) or {}
+    
+    # Push the post into followers' home timelines
+    if FEED_TIMELINE_ENABLED:
+        await timeline_engine.fan_out_post(post_dict, user)
     
     return {
         "id": str(result.inserted_id),
         "userId": current_user_id,
-        "username": user["username"],
-        "userProfilePicture": user.get("profilePicture"),
+        "username": viewer["username"],
+        "userProfilePicture": viewer.get("profilePicture"),
         "imageUrl": image_url,
         "caption": caption,
         "likes": 0,
         "liked": False,
         "comments": [],
+        "commentCount": 0,
         "timestamp": datetime.utcnow()
     }
 
 @api_router.post("/posts/{post_id}/like")
 async def like_post(post_id: str, current_user_id: str = Depends(get_current_user_id)):
-    post = await posts_collection.find_one({"_id": ObjectId(post_id)})
+    if not ObjectId.is_valid(post_id):
+        raise HTTPException(status_code=404, detail="Post not found")
+    
+    # Record the like; the post is only returned when the like is new
+    try:
+        post = await add_like(post_likes_collection, posts_collection, post_id, current_user_id)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Post not found")
+    
     if post:
-        await posts_collection.update_one(
-            {"_id": ObjectId(post_id)},
-            {"$addToSet": {"likes": current_user_id}}
-        )
         # Create notification
-        await create_notification(
+        notification_batcher.emit(
             user_id=post["userId"],
             actor_id=current_user_id,
             notif_type="like",
@@ -374,47 +611,57 @@ async def like_post(post_id: str, current_user_id: str = Depends(get_current_use
 
 @api_router.delete("/posts/{post_id}/like")
 async def unlike_post(post_id: str, current_user_id: str = Depends(get_current_user_id)):
-    await posts_collection.update_one(
-        {"_id": ObjectId(post_id)},
-        {"$pull": {"likes": current_user_id}}
-    )
+    await remove_like(post_likes_collection, posts_collection, post_id, current_user_id)
     return {"message": "Post unliked"}
 
 @api_router.post("/posts/{post_id}/comments")
 async def add_comment(
     post_id: str,
     comment_data: CommentCreate,
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    viewer: dict = Depends(current_user("username"))
 ):
-    # Get user info
-    user = await users_collection.find_one({"_id": ObjectId(current_user_id)})
-    post = await posts_collection.find_one({"_id": ObjectId(post_id)})
-    
-    comment = {
-        "id": str(ObjectId()),
-        "userId": current_user_id,
-        "username": user["username"],
-        "text": comment_data.text,
-        "timestamp": datetime.utcnow()
-    }
+    if not ObjectId.is_valid(post_id):
+        raise HTTPException(status_code=404, detail="Post not found")
     
-    await posts_collection.update_one(
-        {"_id": ObjectId(post_id)},
-        {"$push": {"comments": comment}}
-    )
+    # Store the comment and update the post's counter and preview
+    try:
+        comment, post = await store_comment(
+            comments_collection, posts_collection, post_id,
+            current_user_id, viewer["username"], comment_data.text
+        )
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Post not found")
     
     # Create notification
-    if post:
-        await create_notification(
-            user_id=post["userId"],
-            actor_id=current_user_id,
-            notif_type="comment",
-            message=f'comentou: "{comment_data.text[:30]}"',
-            post_id=post_id,
-            post_image=post["imageUrl"]
-        )
+    notification_batcher.emit(
+        user_id=post["userId"],
+        actor_id=current_user_id,
+        notif_type="comment",
+        message=f'comentou: "{comment_data.text[:30]}"',
+        post_id=post_id,
+        post_image=post["imageUrl"]
+    )
     
-    return comment
+    return format_comment(comment)
+
+@api_router.get("/posts/{post_id}/comments")
+async def get_comments(
+    post_id: str,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Get a post's comments, newest first"""
+    limit = min(limit, MAX_PAGE_SIZE)
+    comments = await comments_collection.find(
+        with_cursor({"postId": post_id}, cursor)
+    ).sort(NEWEST_FIRST).limit(limit).to_list(limit)
+    
+    return json_response({
+        "comments": [format_comment(comment) for comment in comments],
+        "nextCursor": next_cursor(comments, limit)
+    })
 
 @api_router.delete("/posts/{post_id}")
 async def delete_post(post_id: str, current_user_id: str = Depends(get_current_user_id)):
@@ -427,79 +674,73 @@ async def delete_post(post_id: str, current_user_id: str = Depends(get_current_u
     if post["userId"] != current_user_id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this post")
     
-    # Delete image from Cloudinary
-    await delete_image_from_cloudinary(post["imageUrl"])
-    
     # Delete post from database
-    await posts_collection.delete_one({"_id": ObjectId(post_id)})
+    deleted = await posts_collection.delete_one({"_id": ObjectId(post_id)})
+    if deleted.deleted_count:
+        await users_collection.update_one({"_id": ObjectId(current_user_id)}, {"$inc": {"postsCount": -1}})
+    await post_likes_collection.delete_many({"postId": post_id})
+    await comments_collection.delete_many({"postId": post_id})
+    
+    # Queue the image for deletion from storage by the background worker
+    await enqueue_media_deletion(media_garbage_collection, [post["imageUrl"]])
     
     return {"message": "Post deleted"}
 
 # ==================== STORY ROUTES ====================
 
-@api_router.get("/stories")
-async def get_stories(current_user_id: str = Depends(get_current_user_id)):
+@api_router.get("/stories", dependencies=[Depends(current_user())])
+async def get_stories(request: Request, current_user_id: str = Depends(get_current_user_id)):
     # Get current user's following list
-    current_user = await users_collection.find_one({"_id": ObjectId(current_user_id)})
-    following_list = current_user.get("following", [])
+    following_list = await get_following_ids(follows_collection, current_user_id)
     following_list.append(current_user_id)  # Include own stories
     
-    # Get stories from last 24 hours
-    twenty_four_hours_ago = datetime.utcnow() - timedelta(hours=24)
-    
     # If not following anyone, show all stories
-    if len(following_list) <= 1:  # Only has self
-        stories = await stories_collection.find({
-            "timestamp": {"$gte": twenty_four_hours_ago}
-        }).sort("timestamp", -1).to_list(100)
-    else:
-        stories = await stories_collection.find({
-            "userId": {"$in": following_list},
-            "timestamp": {"$gte": twenty_four_hours_ago}
-        }).sort("timestamp", -1).to_list(100)
-    
-    # Group stories by user
-    stories_by_user = {}
-    for story in stories:
-        user_id = story["userId"]
-        if user_id not in stories_by_user:
-            stories_by_user[user_id] = []
-        stories_by_user[user_id].append(story)
-    
-    # Format response
+    author_ids = following_list if len(following_list) > 1 else None
+    
+    # Revalidate from the active stories and the viewer's seen count before running the tray aggregation
+    etag = make_etag(card_epoch(), await story_tray_version(
+        stories_collection, story_views_collection, current_user_id, author_ids
+    ))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    # Active stories grouped by author with the viewer's seen flags, in one aggregation
+    groups = await stories_collection.aggregate(story_tray_pipeline(
+        current_user_id, author_ids, story_views_collection.name
+    )).to_list(None)
+    
+    # Get all story authors in one query (or from the card cache)
+    users = await fetch_user_cards(users_collection, (group["userId"] for group in groups))
+    
     result = []
-    for user_id, user_stories in stories_by_user.items():
-        user = await users_collection.find_one({"_id": ObjectId(user_id)})
-        result.append({
-            "userId": user_id,
-            "username": user["username"],
-            "profilePicture": user.get("profilePicture"),
-            "stories": [
-                {
-                    "id": str(s["_id"]),
-                    "imageUrl": s["imageUrl"],
-                    "timestamp": s["timestamp"]
-                }
-                for s in user_stories
-            ]
-        })
+    for group in groups:
+        user = users.get(group["userId"])
+        if user:
+            result.append({
+                "userId": group["userId"],
+                "username": user["username"],
+                "profilePicture": user.get("profilePicture"),
+                "stories": group["stories"],
+                "allSeen": group["allSeen"]
+            })
     
-    return {"stories": result}
+    return json_response({"stories": result}, etag=etag)
 
 @api_router.post("/stories")
 async def create_story(
     image: UploadFile = File(...),
     current_user_id: str = Depends(get_current_user_id)
 ):
-    # Upload image to Cloudinary
-    image_url = await upload_image_to_cloudinary(image, "instaclone/stories")
+    # Upload image
+    image_url = await upload_media(image, "instaclone/stories")
     
     # Create story
     story_dict = {
         "userId": current_user_id,
         "imageUrl": image_url,
         "timestamp": datetime.utcnow(),
-        "expiresAt": datetime.utcnow() + timedelta(hours=24)
+        "expiresAt": datetime.utcnow() + STORY_TTL
     }
     
     result = await stories_collection.insert_one(story_dict)
@@ -513,53 +754,69 @@ async def create_story(
 # ==================== MESSAGES ROUTES ====================
 
 messages_collection = db.messages
+conversations_collection = db.conversations
 
 @api_router.get("/messages/conversations")
-async def get_conversations(current_user_id: str = Depends(get_current_user_id)):
-    """Get list of conversations"""
-    # Get unique conversations
-    messages = await messages_collection.find({
-        "$or": [
-            {"senderId": current_user_id},
-            {"receiverId": current_user_id}
-        ]
-    }).sort("timestamp", -1).to_list(1000)
+async def get_conversations(
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Get list of conversations, most recent first"""
+    limit = min(limit, MAX_PAGE_SIZE)
+    conversations = await conversations_collection.find(
+        with_cursor({"participants": current_user_id}, cursor, "lastTimestamp", id_type=str)
+    ).sort(INBOX_SORT).limit(limit).to_list(limit)
+    
+    # Get all conversation partners in one query
+    partners = await fetch_user_cards(
+        users_collection,
+        (other_participant(conversation, current_user_id) for conversation in conversations)
+    )
     
-    # Group by conversation
-    conversations = {}
-    for msg in messages:
-        other_user_id = msg["receiverId"] if msg["senderId"] == current_user_id else msg["senderId"]
-        
-        if other_user_id not in conversations:
-            # Get other user info
-            other_user = await users_collection.find_one({"_id": ObjectId(other_user_id)})
-            if other_user:
-                conversations[other_user_id] = {
-                    "userId": other_user_id,
-                    "username": other_user["username"],
-                    "profilePicture": other_user.get("profilePicture"),
-                    "lastMessage": msg["text"],
-                    "timestamp": msg["timestamp"],
-                    "unread": not msg.get("read", False) and msg["receiverId"] == current_user_id
-                }
-    
-    return {"conversations": list(conversations.values())}
+    result = []
+    for conversation in conversations:
+        other_user_id = other_participant(conversation, current_user_id)
+        other_user = partners.get(other_user_id)
+        if other_user:
+            unread_count = conversation.get("unread", {}).get(current_user_id, 0)
+            result.append({
+                "userId": other_user_id,
+                "username": other_user["username"],
+                "profilePicture": other_user.get("profilePicture"),
+                "lastMessage": conversation["lastMessage"],
+                "timestamp": conversation["lastTimestamp"],
+                "unread": unread_count > 0,
+                "unreadCount": unread_count
+            })
+    
+    return json_response({"conversations": result, "nextCursor": next_cursor(conversations, limit, "lastTimestamp")})
+
+@api_router.get("/messages/unread-count")
+async def get_unread_messages_count(current_user_id: str = Depends(get_current_user_id)):
+    """Number of unread messages, for the inbox badge"""
+    counts = await get_unread_counts(users_collection, current_user_id)
+    return {"count": counts["messages"]}
 
 @api_router.get("/messages/{user_id}")
-async def get_messages(user_id: str, current_user_id: str = Depends(get_current_user_id)):
-    """Get messages with a specific user"""
-    messages = await messages_collection.find({
+async def get_messages(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Get messages with a specific user, newest page first (cursor pages back in time)"""
+    limit = min(limit, MAX_PAGE_SIZE)
+    query = {
         "$or": [
             {"senderId": current_user_id, "receiverId": user_id},
             {"senderId": user_id, "receiverId": current_user_id}
         ]
-    }).sort("timestamp", 1).to_list(1000)
+    }
+    page = await messages_collection.find(with_cursor(query, cursor)).sort(NEWEST_FIRST).limit(limit).to_list(limit)
     
-    # Mark as read
-    await messages_collection.update_many(
-        {"senderId": user_id, "receiverId": current_user_id, "read": False},
-        {"$set": {"read": True}}
-    )
+    # Return the page in chronological order
+    messages = list(reversed(page))
     
     result = []
     for msg in messages:
@@ -572,7 +829,7 @@ async def get_messages(user_id: str, current_user_id: str = Depends(get_current_
             "read": msg.get("read", False)
         })
     
-    return {"messages": result}
+    return json_response({"messages": result, "nextCursor": next_cursor(page, limit)})
 
 @api_router.post("/messages/{user_id}")
 async def send_message(
@@ -581,6 +838,10 @@ async def send_message(
     current_user_id: str = Depends(get_current_user_id)
 ):
     """Send a message to a user"""
+    # The receiver id ends up in the conversation's unread.<id> field path
+    if not ObjectId.is_valid(user_id) or not await users_collection.find_one({"_id": ObjectId(user_id)}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="User not found")
+    
     message_dict = {
         "senderId": current_user_id,
         "receiverId": user_id,
@@ -591,14 +852,36 @@ async def send_message(
     
     result = await messages_collection.insert_one(message_dict)
     
-    return {
+    # Update the conversation head for both participants and the receiver's badge
+    await record_message(conversations_collection, message_dict)
+    await increment_user_counters(users_collection, [user_id], "unreadMessages")
+    
+    response = {
         "id": str(result.inserted_id),
         "senderId": current_user_id,
         "receiverId": user_id,
-        "text": message.get("text", ""),
-        "timestamp": datetime.utcnow(),
+        "text": message_dict["text"],
+        "timestamp": message_dict["timestamp"],
         "read": False
     }
+    
+    # Push the message to the receiver's open connections
+    await event_bus.publish(user_id, {"type": "message", "message": jsonable_encoder(response)})
+    
+    return response
+
+@api_router.post("/messages/{user_id}/read")
+async def mark_messages_as_read(user_id: str, current_user_id: str = Depends(get_current_user_id)):
+    """Mark every message received from a user as read"""
+    marked = await mark_messages_read(
+        messages_collection, conversations_collection, users_collection, current_user_id, user_id
+    )
+    
+    # Let the sender know their messages were read
+    if marked:
+        await event_bus.publish(user_id, {"type": "read", "userId": current_user_id})
+    
+    return {"marked": marked}
 
 # ==================== STORY VIEWS ROUTES ====================
 
@@ -607,34 +890,47 @@ story_views_collection = db.story_views
 @api_router.post("/stories/{story_id}/view")
 async def view_story(story_id: str, current_user_id: str = Depends(get_current_user_id)):
     """Record a story view"""
-    # Check if already viewed
-    existing_view = await story_views_collection.find_one({
-        "storyId": story_id,
-        "userId": current_user_id
-    })
-    
-    if not existing_view:
-        await story_views_collection.insert_one({
-            "storyId": story_id,
-            "userId": current_user_id,
-            "timestamp": datetime.utcnow()
-        })
-    
+    await record_story_views(story_views_collection, stories_collection, current_user_id, [story_id])
     return {"message": "View recorded"}
 
+@api_router.post("/stories/views")
+async def view_stories(body: dict, current_user_id: str = Depends(get_current_user_id)):
+    """Record views for several stories at once (e.g. after swiping through a tray)"""
+    story_ids = body.get("storyIds", [])
+    if not isinstance(story_ids, list):
+        raise HTTPException(status_code=400, detail="storyIds must be a list")
+    recorded = await record_story_views(
+        story_views_collection, stories_collection, current_user_id, story_ids[:MAX_PAGE_SIZE]
+    )
+    return {"message": "Views recorded", "recorded": recorded}
+
 @api_router.get("/stories/{story_id}/views")
-async def get_story_views(story_id: str, current_user_id: str = Depends(get_current_user_id)):
-    """Get who viewed a story"""
+async def get_story_views(
+    story_id: str,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Get who viewed a story, most recent first"""
+    limit = min(limit, MAX_PAGE_SIZE)
+    
     # Check if story belongs to current user
-    story = await stories_collection.find_one({"_id": ObjectId(story_id)})
+    story = None
+    if ObjectId.is_valid(story_id):
+        story = await stories_collection.find_one({"_id": ObjectId(story_id)}, {"userId": 1, "viewCount": 1})
     if not story or story["userId"] != current_user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    views = await story_views_collection.find({"storyId": story_id}).to_list(1000)
+    views = await story_views_collection.find(
+        with_cursor({"storyId": story_id}, cursor)
+    ).sort(NEWEST_FIRST).limit(limit).to_list(limit)
+    
+    # Get all viewers in one query
+    viewers = await fetch_user_cards(users_collection, (view["userId"] for view in views))
     
     result = []
     for view in views:
-        user = await users_collection.find_one({"_id": ObjectId(view["userId"])})
+        user = viewers.get(view["userId"])
         if user:
             result.append({
                 "userId": view["userId"],
@@ -643,95 +939,200 @@ async def get_story_views(story_id: str, current_user_id: str = Depends(get_curr
                 "timestamp": view["timestamp"]
             })
     
-    return {"views": result, "count": len(result)}
+    return {"views": result, "count": story.get("viewCount", 0), "nextCursor": next_cursor(views, limit)}
 
 # ==================== POST SHARING ROUTES ====================
 
+share_jobs_collection = db.share_jobs
+
 @api_router.post("/posts/{post_id}/share")
 async def share_post(
     post_id: str,
     share_data: dict,
+    response: Response,
     current_user_id: str = Depends(get_current_user_id)
 ):
-    """Share a post via DM"""
-    user_ids = share_data.get("userIds", [])
+    """Share a post via DM; large shares are queued and reported through GET /shares/{job_id}"""
+    user_ids = dedupe_recipients(share_data.get("userIds", []), current_user_id)
+    if not user_ids:
+        raise HTTPException(status_code=400, detail="No recipients")
+    if len(user_ids) > MAX_SHARE_RECIPIENTS:
+        raise HTTPException(status_code=400, detail=f"Too many recipients (max {MAX_SHARE_RECIPIENTS})")
     
     # Get post info
-    post = await posts_collection.find_one({"_id": ObjectId(post_id)})
+    post = await posts_collection.find_one({"_id": ObjectId(post_id)}, {"_id": 1})
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    # Send message to each user
-    for user_id in user_ids:
-        message_dict = {
-            "senderId": current_user_id,
-            "receiverId": user_id,
-            "text": f"Compartilhou um post",
-            "postId": post_id,
-            "timestamp": datetime.utcnow(),
-            "read": False
-        }
-        await messages_collection.insert_one(message_dict)
+    if len(user_ids) > SHARE_INLINE_LIMIT:
+        job_id = await enqueue_share(share_jobs_collection, current_user_id, post_id, user_ids)
+        response.status_code = 202
+        return {"jobId": str(job_id), "status": "pending", "total": len(user_ids)}
+    
+    results, sent = await share_with_recipients(
+        users_collection, messages_collection, conversations_collection, current_user_id, post_id, user_ids
+    )
+    for message in sent:
+        await event_bus.publish(message["receiverId"], {"type": "message", "message": format_share_message(message)})
+    
+    return {
+        "message": f"Shared with {len(sent)} users",
+        "sentCount": len(sent),
+        "results": results
+    }
+
+@api_router.get("/shares/{job_id}")
+async def get_share_job(job_id: str, current_user_id: str = Depends(get_current_user_id)):
+    """Status of a queued share"""
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=404, detail="Share not found")
+    job = await share_jobs_collection.find_one({"_id": ObjectId(job_id), "senderId": current_user_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Share not found")
     
-    return {"message": f"Shared with {len(user_ids)} users"}
+    return {
+        "jobId": job_id,
+        "postId": job["postId"],
+        "status": job["status"],
+        "total": len(job["recipientIds"]),
+        "sentCount": job.get("sentCount", 0),
+        "results": job.get("results", [])
+    }
 
 # ==================== NOTIFICATIONS ROUTES ====================
 
 notifications_collection = db.notifications
+notification_batcher = NotificationBatcher(notifications_collection, users_collection, event_bus)
 
 @api_router.get("/notifications")
-async def get_notifications(current_user_id: str = Depends(get_current_user_id)):
+async def get_notifications(
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    current_user_id: str = Depends(get_current_user_id)
+):
     """Get user notifications"""
-    notifications = await notifications_collection.find({
-        "userId": current_user_id
-    }).sort("timestamp", -1).limit(50).to_list(50)
+    limit = min(limit, MAX_PAGE_SIZE)
+    notifications = await notifications_collection.find(
+        with_cursor({"userId": current_user_id}, cursor)
+    ).sort(NEWEST_FIRST).limit(limit).to_list(limit)
+    
+    # Get all actors in one query
+    actors = await fetch_user_cards(users_collection, (notif["actorId"] for notif in notifications))
     
     result = []
     for notif in notifications:
-        # Get actor user info
-        actor = await users_collection.find_one({"_id": ObjectId(notif["actorId"])})
+        actor = actors.get(notif["actorId"])
         if actor:
+            actor_count = notif.get("actorCount", 1)
             result.append({
                 "id": str(notif["_id"]),
                 "type": notif["type"],
                 "actorId": notif["actorId"],
                 "actorUsername": actor["username"],
                 "actorProfilePicture": actor.get("profilePicture"),
-                "message": notif.get("message", ""),
+                "actorCount": actor_count,
+                "othersCount": actor_count - 1,
+                "message": notification_message(notif),
                 "postId": notif.get("postId"),
                 "postImage": notif.get("postImage"),
                 "timestamp": notif["timestamp"],
                 "read": notif.get("read", False)
             })
     
-    return {"notifications": result}
+    # Position of the newest notification shown; POST /notifications/read with it as `before`
+    # marks everything the user has seen without touching notifications that arrived since
+    read_cursor = encode_cursor(notifications[0]["timestamp"], notifications[0]["_id"]) if notifications else None
+    
+    return json_response({"notifications": result, "nextCursor": next_cursor(notifications, limit), "readCursor": read_cursor})
+
+@api_router.get("/notifications/unread-count")
+async def get_unread_notifications_count(current_user_id: str = Depends(get_current_user_id)):
+    """Number of unread notifications, for the activity badge"""
+    counts = await get_unread_counts(users_collection, current_user_id)
+    return {"count": counts["notifications"]}
+
+@api_router.post("/notifications/read")
+async def mark_notifications_as_read(body: dict, current_user_id: str = Depends(get_current_user_id)):
+    """Mark notifications as read, either by ids or everything at or before a cursor"""
+    ids = body.get("ids")
+    before = body.get("before")
+    if ids is None and not before:
+        raise HTTPException(status_code=400, detail="Provide ids or before")
+    if ids is not None:
+        if not isinstance(ids, list):
+            raise HTTPException(status_code=400, detail="ids must be a list")
+        ids = ids[:MAX_PAGE_SIZE]
+    marked = await mark_notifications_read(
+        notifications_collection, users_collection, current_user_id, ids=ids, before=before
+    )
+    return {"marked": marked}
 
 @api_router.post("/notifications/{notification_id}/read")
 async def mark_notification_read(notification_id: str, current_user_id: str = Depends(get_current_user_id)):
     """Mark notification as read"""
-    await notifications_collection.update_one(
-        {"_id": ObjectId(notification_id), "userId": current_user_id},
-        {"$set": {"read": True}}
-    )
+    await mark_notifications_read(notifications_collection, users_collection, current_user_id, ids=[notification_id])
     return {"message": "Notification marked as read"}
 
-# Helper function to create notification
-async def create_notification(user_id: str, actor_id: str, notif_type: str, message: str, post_id: str = None, post_image: str = None):
-    """Create a notification"""
-    if user_id != actor_id:  # Don't notify yourself
-        await notifications_collection.insert_one({
-            "userId": user_id,
-            "actorId": actor_id,
-            "type": notif_type,
-            "message": message,
-            "postId": post_id,
-            "postImage": post_image,
-            "timestamp": datetime.utcnow(),
-            "read": False
-        })
+# ==================== EVENTS ROUTES ====================
+
+# Comment lines sent on idle streams so proxies keep the connection open
+EVENT_STREAM_HEARTBEAT_SECONDS = 25
+
+@api_router.post("/events/token")
+async def create_event_stream_token(current_user_id: str = Depends(get_current_user_id)):
+    """Short-lived token for opening /events, which receives it in the query string"""
+    return {"token": create_stream_token(current_user_id), "expiresIn": STREAM_TOKEN_SECONDS}
 
-# Include the router in the main app
+@api_router.get("/events")
+async def stream_events(request: Request, current_user_id: str = Depends(get_stream_user_id)):
+    """Server-sent events: new messages, read receipts and notifications for the current user"""
+    async def event_stream():
+        async with event_bus.subscribe(current_user_id) as queue:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), EVENT_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ==================== METRICS ROUTES ====================
+
+# Served outside /api so the public proxy (nginx `location /api`) does not expose it, and
+# only to requests sending METRICS_TOKEN in X-Metrics-Token; without a token it stays closed
+internal_router = APIRouter(prefix="/internal")
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+def require_metrics_token(x_metrics_token: Optional[str] = Header(None)):
+    if not METRICS_TOKEN or not secrets.compare_digest(x_metrics_token or "", METRICS_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+@internal_router.get("/metrics", dependencies=[Depends(require_metrics_token)])
+async def get_metrics():
+    """Internal counters for capacity monitoring"""
+    return {
+        "passwordHashing": get_password_hashing_stats(),
+        "notifications": notification_batcher.get_stats(),
+        "userCardCache": user_card_cache.get_stats(),
+        "viewerCache": viewer_cache.get_stats()
+    }
+
+# Include the routers in the main app
 app.include_router(api_router)
+app.include_router(internal_router)
+
+# Serve uploads when media is stored on the local filesystem
+media_storage = get_media_storage()
+if isinstance(media_storage, LocalMediaStorage):
+    media_storage.root.mkdir(parents=True, exist_ok=True)
+    app.mount(media_storage.base_url, StaticFiles(directory=media_storage.root), name="media")
 
 app.add_middleware(
     CORSMiddleware,
@@ -748,6 +1149,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+background_tasks = []
+
+@app.on_event("startup")
+async def create_indexes():
+    await ensure_indexes(db)
+
+@app.on_event("startup")
+async def start_background_workers():
+    await event_bus.start()
+    background_tasks.append(asyncio.create_task(run_media_garbage_worker(media_garbage_collection)))
+    background_tasks.append(asyncio.create_task(
+        run_suggestions_refresher(user_suggestions_collection, follows_collection, users_collection)
+    ))
+    background_tasks.append(asyncio.create_task(notification_batcher.run()))
+    background_tasks.append(asyncio.create_task(user_card_cache.listen_for_invalidations(event_bus)))
+    background_tasks.append(asyncio.create_task(viewer_cache.listen_for_invalidations(event_bus)))
+    background_tasks.append(asyncio.create_task(run_share_worker(
+        share_jobs_collection, users_collection, messages_collection, conversations_collection, event_bus
+    )))
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    # Write notifications still queued in memory before the process exits
+    await notification_batcher.stop()
+    await event_bus.stop()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
\ No newline at end of file
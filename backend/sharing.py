@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from conversations import conversation_id, head_update
+from counters import increment_user_counters
+
+logger = logging.getLogger(__name__)
+
+SHARE_TEXT = "Compartilhou um post"
+# Recipients beyond this are rejected; duplicates and the sender are dropped first
+MAX_SHARE_RECIPIENTS = int(os.environ.get('MAX_SHARE_RECIPIENTS', '500'))
+# Shares to more recipients than this are queued in share_jobs and sent by the background worker
+SHARE_INLINE_LIMIT = int(os.environ.get('SHARE_INLINE_LIMIT', '50'))
+SHARE_POLL_SECONDS = float(os.environ.get('SHARE_POLL_SECONDS', '2'))
+# A running job not finished within this is assumed lost (worker restarted) and picked up again
+SHARE_LEASE_SECONDS = 5 * 60
+
+def dedupe_recipients(user_ids: Iterable[str], sender_id: str) -> List[str]:
+    """Recipient ids in request order, without duplicates or the sender"""
+    seen = {sender_id}
+    recipients = []
+    for user_id in user_ids:
+        if isinstance(user_id, str) and user_id not in seen:
+            seen.add(user_id)
+            recipients.append(user_id)
+    return recipients
+
+async def share_with_recipients(
+    users_collection,
+    messages_collection,
+    conversations_collection,
+    sender_id: str,
+    post_id: str,
+    recipient_ids: List[str],
+    share_id: Optional[ObjectId] = None,
+    skip_ids: Iterable[str] = ()
+) -> Tuple[List[Dict[str, str]], List[dict]]:
+    """
+    Send a post to many users with one recipient lookup, one unordered insert_many,
+    one bulk_write of conversation heads and one update_many of unread counters.
+    Returns per-recipient results ({userId, status}) and the inserted messages.
+    """
+    results: Dict[str, str] = {user_id: "sent" for user_id in skip_ids}
+
+    valid_ids = [user_id for user_id in recipient_ids if ObjectId.is_valid(user_id)]
+    found = await users_collection.find(
+        {"_id": {"$in": [ObjectId(user_id) for user_id in valid_ids]}}, {"_id": 1}
+    ).to_list(None)
+    existing = {str(user["_id"]) for user in found}
+
+    now = datetime.utcnow()
+    messages = []
+    for user_id in recipient_ids:
+        if user_id in results:
+            continue
+        if user_id not in existing:
+            results[user_id] = "not_found"
+            continue
+        message = {
+            "_id": ObjectId(),
+            "senderId": sender_id,
+            "receiverId": user_id,
+            "text": SHARE_TEXT,
+            "postId": post_id,
+            "timestamp": now,
+            "read": False
+        }
+        if share_id:
+            message["shareId"] = share_id
+        messages.append(message)
+
+    failed = set()
+    if messages:
+        try:
+            await messages_collection.insert_many(messages, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            logger.warning(f"Share of post {post_id}: {len(failed)} of {len(messages)} messages failed")
+
+    sent = [message for index, message in enumerate(messages) if index not in failed]
+    for index, message in enumerate(messages):
+        results[message["receiverId"]] = "failed" if index in failed else "sent"
+
+    if sent:
+        await conversations_collection.bulk_write([
+            UpdateOne(
+                {"_id": conversation_id(message["senderId"], message["receiverId"])},
+                head_update(message),
+                upsert=True
+            )
+            for message in sent
+        ], ordered=False)
+        await increment_user_counters(users_collection, (message["receiverId"] for message in sent), "unreadMessages")
+
+    return [{"userId": user_id, "status": results[user_id]} for user_id in recipient_ids], sent
+
+async def enqueue_share(share_jobs_collection, sender_id: str, post_id: str, recipient_ids: List[str]) -> ObjectId:
+    """Queue a large share for the background worker"""
+    result = await share_jobs_collection.insert_one({
+        "senderId": sender_id,
+        "postId": post_id,
+        "recipientIds": recipient_ids,
+        "status": "pending",
+        "attempts": 0,
+        "createdAt": datetime.utcnow()
+    })
+    return result.inserted_id
+
+async def process_share_job(share_jobs_collection, users_collection, messages_collection,
+                            conversations_collection, event_bus) -> bool:
+    """Claim and send one queued share; returns False when there was nothing to do"""
+    now = datetime.utcnow()
+    job = await share_jobs_collection.find_one_and_update(
+        {"$or": [
+            {"status": "pending"},
+            {"status": "running", "startedAt": {"$lt": now - timedelta(seconds=SHARE_LEASE_SECONDS)}}
+        ]},
+        {"$set": {"status": "running", "startedAt": now}, "$inc": {"attempts": 1}},
+        sort=[("createdAt", 1)]
+    )
+    if not job:
+        return False
+
+    # A retried job may have sent part of its messages before the worker went away
+    skip_ids = []
+    if job["attempts"] > 0:
+        skip_ids = await messages_collection.distinct("receiverId", {"shareId": job["_id"]})
+
+    try:
+        results, sent = await share_with_recipients(
+            users_collection, messages_collection, conversations_collection,
+            job["senderId"], job["postId"], job["recipientIds"], job["_id"], skip_ids
+        )
+    except Exception as e:
+        logger.error(f"Share job {job['_id']} failed: {str(e)}")
+        await share_jobs_collection.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": "failed", "error": str(e), "finishedAt": datetime.utcnow()}}
+        )
+        return True
+
+    await share_jobs_collection.update_one(
+        {"_id": job["_id"]},
+        {"$set": {
+            "status": "done",
+            "results": results,
+            "sentCount": sum(1 for result in results if result["status"] == "sent"),
+            "finishedAt": datetime.utcnow()
+        }}
+    )
+    for message in sent:
+        await event_bus.publish(message["receiverId"], {"type": "message", "message": format_share_message(message)})
+    return True
+
+def format_share_message(message: dict) -> dict:
+    return {
+        "id": str(message["_id"]),
+        "senderId": message["senderId"],
+        "receiverId": message["receiverId"],
+        "text": message["text"],
+        "postId": message["postId"],
+        "timestamp": message["timestamp"].isoformat(),
+        "read": False
+    }
+
+async def run_share_worker(share_jobs_collection, users_collection, messages_collection,
+                           conversations_collection, event_bus):
+    """Send queued shares until cancelled"""
+    while True:
+        try:
+            claimed = await process_share_job(
+                share_jobs_collection, users_collection, messages_collection, conversations_collection, event_bus
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Share worker error: {str(e)}")
+            claimed = False
+        if not claimed:
+            await asyncio.sleep(SHARE_POLL_SECONDS)
@@ -0,0 +1,67 @@
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, List
+
+class MediaStorage:
+    """
+    Where uploaded media ends up. Methods are blocking and are called from an executor.
+    """
+    def upload(self, path: str, folder: str, resource_type: str) -> str:
+        """Store the file at `path` and return its public URL"""
+        raise NotImplementedError
+
+    def delete(self, url: str) -> bool:
+        """Delete the media behind a URL returned by upload()"""
+        raise NotImplementedError
+
+    def delete_many(self, urls: List[str]) -> Dict[str, bool]:
+        """Delete several URLs; returns url -> whether it is gone. Backends with a bulk API override this."""
+        return {url: self.delete(url) for url in urls}
+
+    def thumbnail_url(self, url: str) -> str:
+        """URL of a small square still for grids (no I/O). Backends without resizing return the original."""
+        return url
+
+class LocalMediaStorage(MediaStorage):
+    """
+    Stores media on the local filesystem. Used for development and for
+    benchmarking the upload path without a Cloudinary account.
+    """
+    def __init__(self, root: str, base_url: str):
+        self.root = Path(root).resolve()
+        self.base_url = base_url.rstrip("/")
+
+    def upload(self, path: str, folder: str, resource_type: str) -> str:
+        name = uuid.uuid4().hex + Path(path).suffix
+        destination = self.root / folder / name
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(path, destination)
+        return f"{self.base_url}/{folder}/{name}"
+
+    def delete(self, url: str) -> bool:
+        if not url.startswith(self.base_url + "/"):
+            return False
+        path = (self.root / url[len(self.base_url) + 1:]).resolve()
+        if self.root not in path.parents:
+            return False
+        # Already gone counts as deleted
+        path.unlink(missing_ok=True)
+        return True
+
+_storage = None
+
+def get_media_storage() -> MediaStorage:
+    """Return the configured storage backend (MEDIA_STORAGE=cloudinary|local)"""
+    global _storage
+    if _storage is None:
+        if os.environ.get('MEDIA_STORAGE', 'cloudinary') == 'local':
+            _storage = LocalMediaStorage(
+                os.environ.get('MEDIA_ROOT', str(Path(__file__).parent / 'media')),
+                os.environ.get('MEDIA_BASE_URL', '/api/media')
+            )
+        else:
+            from cloudinary_config import CloudinaryMediaStorage
+            _storage = CloudinaryMediaStorage()
+    return _storage
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+# Stories and story views carry expiresAt; TTL indexes delete them once it passes
+STORY_TTL = timedelta(hours=24)
+# Duplicate key: a concurrent upsert of the same (storyId, userId) view won the race
+DUPLICATE_KEY_ERROR = 11000
+# Without followed authors the tray shows the newest stories from everyone, capped at this many.
+# expiresAt is timestamp + STORY_TTL, so the newest stories are the first ones on the expiresAt index.
+DISCOVERY_STORY_LIMIT = 100
+
+def _active_stories(author_ids: Optional[List[str]]) -> dict:
+    match = {"expiresAt": {"$gt": datetime.utcnow()}}
+    if author_ids is not None:
+        match["userId"] = {"$in": author_ids}
+    return match
+
+def _discovery_limit(author_ids: Optional[List[str]]) -> list:
+    if author_ids is not None:
+        return []
+    return [{"$sort": {"expiresAt": -1}}, {"$limit": DISCOVERY_STORY_LIMIT}]
+
+def story_tray_pipeline(viewer_id: str, author_ids: Optional[List[str]], story_views_name: str) -> list:
+    """
+    Active stories grouped by author, newest author first, each story flagged with
+    whether viewer_id has seen it. author_ids=None means every author (newest
+    DISCOVERY_STORY_LIMIT stories).
+    Authors are hydrated by the caller through the user card cache.
+    """
+    return [
+        {"$match": _active_stories(author_ids)},
+        *_discovery_limit(author_ids),
+        {"$sort": {"timestamp": -1}},
+        {"$lookup": {
+            "from": story_views_name,
+            "let": {"storyId": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$storyId", "$$storyId"]},
+                    {"$eq": ["$userId", viewer_id]}
+                ]}}},
+                {"$limit": 1},
+                {"$project": {"_id": 1}}
+            ],
+            "as": "viewerViews"
+        }},
+        {"$group": {
+            "_id": "$userId",
+            "latest": {"$max": "$timestamp"},
+            "stories": {"$push": {
+                "id": {"$toString": "$_id"},
+                "imageUrl": "$imageUrl",
+                "timestamp": "$timestamp",
+                "seen": {"$gt": [{"$size": "$viewerViews"}, 0]}
+            }}
+        }},
+        {"$sort": {"latest": -1, "_id": 1}},
+        {"$project": {
+            "_id": 0,
+            "userId": "$_id",
+            "stories": 1,
+            "allSeen": {"$allElementsTrue": ["$stories.seen"]}
+        }}
+    ]
+
+async def story_tray_version(stories_collection, story_views_collection, viewer_id: str,
+                             author_ids: Optional[List[str]]) -> tuple:
+    """
+    What the tray for viewer_id is built from, without running the tray aggregation:
+    the active stories and how many of them the viewer has seen.
+    """
+    stories = await stories_collection.aggregate([
+        {"$match": _active_stories(author_ids)},
+        *_discovery_limit(author_ids),
+        {"$project": {"_id": 1}}
+    ]).to_list(None)
+    seen = 0
+    if stories:
+        seen = await story_views_collection.count_documents({
+            "storyId": {"$in": [str(story["_id"]) for story in stories]},
+            "userId": viewer_id
+        })
+    return sorted(str(story["_id"]) for story in stories), seen
+
+async def record_story_views(story_views_collection, stories_collection, user_id: str, story_ids: Iterable[str]) -> int:
+    """
+    Record that user_id viewed each story with one unordered bulk of upserts against the
+    unique (storyId, userId) index, then bump viewCount on the stories seen for the first
+    time. Repeat views change nothing. Returns how many views were new.
+    """
+    story_ids = list(dict.fromkeys(story_id for story_id in story_ids if ObjectId.is_valid(story_id)))
+    if not story_ids:
+        return 0
+
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {"storyId": story_id, "userId": user_id},
+            {"$setOnInsert": {"timestamp": now, "expiresAt": now + STORY_TTL}},
+            upsert=True
+        )
+        for story_id in story_ids
+    ]
+    try:
+        result = await story_views_collection.bulk_write(operations, ordered=False)
+        upserted = result.upserted_ids
+    except BulkWriteError as e:
+        if any(error["code"] != DUPLICATE_KEY_ERROR for error in e.details.get("writeErrors", [])):
+            raise
+        upserted = {op["index"]: op["_id"] for op in e.details.get("upserted", [])}
+
+    new_views = [ObjectId(story_ids[index]) for index in upserted]
+    if new_views:
+        await stories_collection.update_many({"_id": {"$in": new_views}}, {"$inc": {"viewCount": 1}})
+    return len(new_views)
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List
+
+from follows import get_following_ids
+
+logger = logging.getLogger(__name__)
+
+# "Suggested for you" lists are precomputed per user from friends-of-friends and stored in
+# user_suggestions: {_id: userId, userIds: [...], updatedAt}
+SUGGESTIONS_SIZE = 20
+SUGGESTIONS_TTL = timedelta(hours=6)
+# At most this many follows seed the friends-of-friends walk, bounding its cost
+SUGGESTIONS_SEED_SIZE = 200
+SUGGESTIONS_REFRESH_BATCH = 100
+SUGGESTIONS_REFRESH_SECONDS = 60
+
+async def compute_suggestions(follows_collection, users_collection, user_id: str) -> List[str]:
+    """Users followed by the people user_id follows, ranked by how many of them follow each one"""
+    following = await get_following_ids(follows_collection, user_id)
+    excluded = set(following) | {user_id}
+
+    seeds = following[-SUGGESTIONS_SEED_SIZE:]
+    suggested = []
+    if seeds:
+        rows = await follows_collection.aggregate([
+            {"$match": {"followerId": {"$in": seeds}}},
+            {"$match": {"followeeId": {"$nin": list(excluded)}}},
+            {"$group": {"_id": "$followeeId", "mutual": {"$sum": 1}}},
+            {"$sort": {"mutual": -1, "_id": 1}},
+            {"$limit": SUGGESTIONS_SIZE}
+        ]).to_list(SUGGESTIONS_SIZE)
+        suggested = [row["_id"] for row in rows]
+
+    # Fill up with the most followed accounts (new users have no friends-of-friends yet)
+    if len(suggested) < SUGGESTIONS_SIZE:
+        popular = await users_collection.find({}, {"_id": 1}).sort(
+            [("followersCount", -1), ("_id", -1)]
+        ).limit(SUGGESTIONS_SIZE * 5).to_list(None)
+        for user in popular:
+            candidate = str(user["_id"])
+            if candidate not in excluded and candidate not in suggested:
+                suggested.append(candidate)
+            if len(suggested) >= SUGGESTIONS_SIZE:
+                break
+
+    return suggested
+
+async def refresh_suggestions(suggestions_collection, follows_collection, users_collection, user_id: str) -> List[str]:
+    user_ids = await compute_suggestions(follows_collection, users_collection, user_id)
+    await suggestions_collection.update_one(
+        {"_id": user_id},
+        {"$set": {"userIds": user_ids, "updatedAt": datetime.utcnow()}},
+        upsert=True
+    )
+    return user_ids
+
+async def get_suggestions(suggestions_collection, follows_collection, users_collection, user_id: str) -> List[str]:
+    """Precomputed suggestions for user_id, computed on first use"""
+    stored = await suggestions_collection.find_one({"_id": user_id})
+    if stored:
+        return stored["userIds"]
+    return await refresh_suggestions(suggestions_collection, follows_collection, users_collection, user_id)
+
+async def run_suggestions_refresher(suggestions_collection, follows_collection, users_collection):
+    """Periodically recompute suggestion lists older than SUGGESTIONS_TTL until cancelled"""
+    while True:
+        try:
+            stale = await suggestions_collection.find(
+                {"updatedAt": {"$lt": datetime.utcnow() - SUGGESTIONS_TTL}}, {"_id": 1}
+            ).sort("updatedAt", 1).limit(SUGGESTIONS_REFRESH_BATCH).to_list(SUGGESTIONS_REFRESH_BATCH)
+            for doc in stale:
+                await refresh_suggestions(suggestions_collection, follows_collection, users_collection, doc["_id"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Suggestions refresher error: {str(e)}")
+            stale = []
+        if len(stale) < SUGGESTIONS_REFRESH_BATCH:
+            await asyncio.sleep(SUGGESTIONS_REFRESH_SECONDS)
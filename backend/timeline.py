@@ -0,0 +1,167 @@
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from follows import get_following_ids
+from pagination import NEWEST_FIRST, decode_cursor, with_cursor
+
+# Home timelines are materialized on write unless FEED_TIMELINE=0
+FEED_TIMELINE_ENABLED = os.environ.get('FEED_TIMELINE', '1') != '0'
+# Entries kept per timeline; older pages fall back to fan-out-on-read
+TIMELINE_SIZE = int(os.environ.get('TIMELINE_SIZE', '500'))
+# Authors with at least this many followers are merged at read time instead of fanned out
+CELEBRITY_FOLLOWER_THRESHOLD = int(os.environ.get('CELEBRITY_FOLLOWER_THRESHOLD', '10000'))
+# Timelines are dropped this long after they were built (TTL index) and rebuilt on the next read,
+# so inactive users stop costing fan-out writes
+TIMELINE_TTL_SECONDS = 7 * 24 * 60 * 60
+FAN_OUT_BATCH_SIZE = 1000
+
+_ENTRY_SORT = {"timestamp": -1, "postId": -1}
+
+def _entry(post: dict) -> dict:
+    return {"postId": post["_id"], "userId": post["userId"], "timestamp": post["timestamp"]}
+
+def _push_entries(entries: List[dict]) -> dict:
+    return {"$push": {"entries": {"$each": entries, "$sort": _ENTRY_SORT, "$slice": TIMELINE_SIZE}}}
+
+def is_celebrity(user: dict) -> bool:
+    """Whether user's posts are merged at read time; once marked, a user stays a celebrity"""
+    return user.get("celebrity", False) or user.get("followersCount", 0) >= CELEBRITY_FOLLOWER_THRESHOLD
+
+_CELEBRITY_QUERY = {"$or": [{"celebrity": True}, {"followersCount": {"$gte": CELEBRITY_FOLLOWER_THRESHOLD}}]}
+
+class TimelineEngine:
+    """
+    Fan-out-on-write home timelines stored one document per user:
+    {_id: userId, entries: [{postId, userId, timestamp}, ...], celebrities: [userId, ...], builtAt}
+    Entries are kept newest first and capped at TIMELINE_SIZE. celebrities are the followed
+    users whose posts are not fanned out; reads merge them in without loading the follow list.
+    """
+    def __init__(self, timelines_collection, posts_collection, users_collection, follows_collection):
+        self.timelines = timelines_collection
+        self.posts = posts_collection
+        self.users = users_collection
+        self.follows = follows_collection
+
+    async def _update_followers(self, author_id: str, update: dict):
+        """Apply update to the materialized timelines of everyone following author_id"""
+        edges = self.follows.find({"followeeId": author_id}, {"_id": 0, "followerId": 1}).batch_size(FAN_OUT_BATCH_SIZE)
+        batch = []
+        async for edge in edges:
+            batch.append(UpdateOne({"_id": edge["followerId"]}, update))
+            if len(batch) >= FAN_OUT_BATCH_SIZE:
+                await self.timelines.bulk_write(batch, ordered=False)
+                batch = []
+        if batch:
+            await self.timelines.bulk_write(batch, ordered=False)
+
+    async def fan_out_post(self, post: dict, author: dict):
+        """Push a new post into the author's and, unless they are a celebrity, their followers' timelines"""
+        update = _push_entries([_entry(post)])
+        # Only timelines that are already materialized are updated; missing ones are built on read
+        await self.timelines.update_one({"_id": post["userId"]}, update)
+        if not is_celebrity(author):
+            await self._update_followers(post["userId"], update)
+
+    async def _mark_celebrity(self, user_id: str):
+        """
+        Once a user reaches CELEBRITY_FOLLOWER_THRESHOLD their posts stop being fanned out,
+        so add them to their followers' celebrities once, when they cross it
+        """
+        marked = await self.users.update_one(
+            {"_id": ObjectId(user_id), "celebrity": {"$ne": True},
+             "followersCount": {"$gte": CELEBRITY_FOLLOWER_THRESHOLD}},
+            {"$set": {"celebrity": True}}
+        )
+        if marked.modified_count:
+            await self._update_followers(user_id, {"$addToSet": {"celebrities": user_id}})
+
+    async def add_followee(self, user_id: str, followee_id: str):
+        """Backfill a newly followed user's recent posts into the follower's timeline, or list them as a celebrity"""
+        followee = await self.users.find_one({"_id": ObjectId(followee_id)}, {"followersCount": 1, "celebrity": 1})
+        if not followee:
+            return
+        if is_celebrity(followee):
+            if not followee.get("celebrity"):
+                await self._mark_celebrity(followee_id)
+            await self.timelines.update_one({"_id": user_id}, {"$addToSet": {"celebrities": followee_id}})
+            return
+
+        posts = await self.posts.find(
+            {"userId": followee_id}, {"userId": 1, "timestamp": 1}
+        ).sort(NEWEST_FIRST).limit(TIMELINE_SIZE).to_list(TIMELINE_SIZE)
+        if posts:
+            await self.timelines.update_one({"_id": user_id}, _push_entries([_entry(p) for p in posts]))
+
+    async def remove_followee(self, user_id: str, followee_id: str):
+        await self.timelines.update_one(
+            {"_id": user_id},
+            {"$pull": {"entries": {"userId": followee_id}, "celebrities": followee_id}}
+        )
+
+    async def _build(self, user_id: str) -> dict:
+        """Materialize user_id's timeline; the only read that loads the whole follow list"""
+        followee_ids = await get_following_ids(self.follows, user_id)
+        celebrities = await self.users.find(
+            {"_id": {"$in": [ObjectId(f) for f in followee_ids if ObjectId.is_valid(f)]}, **_CELEBRITY_QUERY},
+            {"_id": 1}
+        ).to_list(None)
+        posts = await self.posts.find(
+            {"userId": {"$in": followee_ids + [user_id]}}, {"userId": 1, "timestamp": 1}
+        ).sort(NEWEST_FIRST).limit(TIMELINE_SIZE).to_list(TIMELINE_SIZE)
+        timeline = {
+            "entries": [_entry(p) for p in posts],
+            "celebrities": [str(c["_id"]) for c in celebrities],
+            "builtAt": datetime.utcnow()
+        }
+        await self.timelines.update_one({"_id": user_id}, {"$set": timeline}, upsert=True)
+        return timeline
+
+    async def read(
+        self,
+        user_id: str,
+        cursor: Optional[str],
+        skip: int,
+        limit: int
+    ) -> Optional[List[dict]]:
+        """
+        Return the next page of the home timeline as [{_id, userId, timestamp}], newest first,
+        or None when the page lies beyond the materialized entries and must be read from posts.
+        """
+        timeline = await self.timelines.find_one({"_id": user_id})
+        # Timelines stored before celebrities were tracked are rebuilt once
+        if not timeline or "celebrities" not in timeline:
+            timeline = await self._build(user_id)
+        entries = timeline["entries"]
+        truncated = len(entries) >= TIMELINE_SIZE
+        # Posts older than the last stored entry of a truncated timeline may be missing from it
+        oldest = (entries[-1]["timestamp"], entries[-1]["postId"]) if truncated else None
+
+        if cursor:
+            value, object_id = decode_cursor(cursor)
+            entries = [e for e in entries if (e["timestamp"], e["postId"]) < (value, object_id)]
+
+        # Celebrity authors are not fanned out; merge their posts at read time
+        celebrity_posts = []
+        if timeline["celebrities"]:
+            wanted = skip + limit
+            celebrity_posts = await self.posts.find(
+                with_cursor({"userId": {"$in": timeline["celebrities"]}}, cursor),
+                {"userId": 1, "timestamp": 1}
+            ).sort(NEWEST_FIRST).limit(wanted).to_list(wanted)
+
+        merged = {e["postId"]: {"_id": e["postId"], "userId": e["userId"], "timestamp": e["timestamp"]} for e in entries}
+        for post in celebrity_posts:
+            # Merging celebrity posts past that point would fill pages and skip the regular authors' older posts
+            if oldest and (post["timestamp"], post["_id"]) < oldest:
+                continue
+            merged.setdefault(post["_id"], post)
+        page = sorted(merged.values(), key=lambda p: (p["timestamp"], p["_id"]), reverse=True)[skip:skip + limit]
+
+        # A full timeline has been truncated; past its end the caller reads posts directly
+        if len(page) < limit and truncated:
+            return None
+        return page
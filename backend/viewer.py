@@ -0,0 +1,69 @@
+import os
+from typing import Callable, Dict, FrozenSet
+
+from bson import ObjectId
+from fastapi import Depends, HTTPException
+
+from auth import get_current_user_id
+from cache import TTLCache, TwoTierCache
+
+# The authenticated user's own document, loaded by the current_user(...) dependency.
+# Users carry a `version` counter bumped by every profile write (missing means 0);
+# cached fields are only merged with freshly read ones of the same version.
+VIEWER_CACHE_SIZE = int(os.environ.get('VIEWER_CACHE_SIZE', '10000'))
+VIEWER_CACHE_TTL = float(os.environ.get('VIEWER_CACHE_TTL', '5'))
+
+# Counters move on every follow, post and notification without a version bump,
+# so they are always read from the database
+VOLATILE_FIELDS = {"followersCount", "followingCount", "postsCount", "unreadNotifications", "unreadMessages"}
+
+# What /auth/me and PUT /users/profile return about the viewer
+SELF_PROFILE_FIELDS = (
+    "email", "username", "fullName", "profilePicture", "bio",
+    "followersCount", "followingCount", "postsCount"
+)
+
+viewer_cache = TwoTierCache("viewers", TTLCache(VIEWER_CACHE_SIZE, VIEWER_CACHE_TTL))
+
+class CurrentUserLoader:
+    """
+    current_user("username", ...) returns a dependency yielding those fields of the
+    authenticated user. The same field set always maps to the same callable, so FastAPI
+    runs it once per request however many dependencies ask for it.
+    """
+    def __init__(self, users_collection):
+        self.users = users_collection
+        self._dependencies: Dict[FrozenSet[str], Callable] = {}
+
+    def __call__(self, *fields: str) -> Callable:
+        key = frozenset(fields)
+        dependency = self._dependencies.get(key)
+        if dependency is None:
+            async def dependency(user_id: str = Depends(get_current_user_id)) -> dict:
+                return await self.load(user_id, key)
+            self._dependencies[key] = dependency
+        return dependency
+
+    async def load(self, user_id: str, fields: FrozenSet[str]) -> dict:
+        """Projected user document; 401 when the token's user no longer exists"""
+        cached = (await viewer_cache.get_many([user_id])).get(user_id)
+        if cached and fields.isdisjoint(VOLATILE_FIELDS) and fields.issubset(cached):
+            return cached
+
+        user = None
+        if ObjectId.is_valid(user_id):
+            projection = {field: 1 for field in fields}
+            projection["version"] = 1
+            user = await self.users.find_one({"_id": ObjectId(user_id)}, projection)
+        if not user:
+            raise HTTPException(status_code=401, detail="User no longer exists")
+
+        stable = {field: value for field, value in user.items() if field not in VOLATILE_FIELDS}
+        if cached and cached.get("version", 0) == user.get("version", 0):
+            stable = {**cached, **stable}
+        await viewer_cache.set_many({user_id: stable})
+        return user
+
+async def invalidate_viewer(user_id: str):
+    """Drop a user's cached document after a write that bumped its version"""
+    await viewer_cache.invalidate(user_id)
@@ -26,7 +26,12 @@ export const authAPI = {
 
 // User API
 export const userAPI = {
-  search: (query) => api.get(`/users/search?q=${query}`),
+  search: (query, cursor) => api.get('/users/search', { params: { q: query, cursor } }),
+  getProfile: (idOrUsername) => api.get(`/users/${idOrUsername}`),
+  getSuggestions: () => api.get('/users/suggestions'),
+  getPosts: (userId, cursor) => api.get(`/users/${userId}/posts`, { params: { cursor } }),
+  getFollowers: (userId, cursor) => api.get(`/users/${userId}/followers`, { params: { cursor } }),
+  getFollowing: (userId, cursor) => api.get(`/users/${userId}/following`, { params: { cursor } }),
   updateProfile: (formData) => api.put('/users/profile', formData, {
     headers: { 'Content-Type': 'multipart/form-data' }
   }),
@@ -36,13 +41,16 @@ export const userAPI = {
 
 // Post API
 export const postAPI = {
-  getFeed: (page = 1) => api.get(`/posts/feed?page=${page}&limit=10`),
+  getFeed: (page = 1, cursor) => api.get('/posts/feed', {
+    params: cursor ? { cursor, limit: 10 } : { page, limit: 10 }
+  }),
   create: (formData) => api.post('/posts', formData, {
     headers: { 'Content-Type': 'multipart/form-data' }
   }),
   like: (postId) => api.post(`/posts/${postId}/like`),
   unlike: (postId) => api.delete(`/posts/${postId}/like`),
   addComment: (postId, text) => api.post(`/posts/${postId}/comments`, { text }),
+  getComments: (postId, cursor) => api.get(`/posts/${postId}/comments`, { params: { cursor } }),
   delete: (postId) => api.delete(`/posts/${postId}`),
 };
 
@@ -53,25 +61,65 @@ export const storyAPI = {
     headers: { 'Content-Type': 'multipart/form-data' }
   }),
   view: (storyId) => api.post(`/stories/${storyId}/view`),
-  getViews: (storyId) => api.get(`/stories/${storyId}/views`),
+  viewMany: (storyIds) => api.post('/stories/views', { storyIds }),
+  getViews: (storyId, cursor) => api.get(`/stories/${storyId}/views`, { params: { cursor } }),
 };
 
 // Messages API
 export const messageAPI = {
-  getConversations: () => api.get('/messages/conversations'),
-  getMessages: (userId) => api.get(`/messages/${userId}`),
+  getConversations: (cursor) => api.get('/messages/conversations', { params: { cursor } }),
+  getMessages: (userId, cursor) => api.get(`/messages/${userId}`, { params: { cursor } }),
   sendMessage: (userId, text) => api.post(`/messages/${userId}`, { text }),
+  markAsRead: (userId) => api.post(`/messages/${userId}/read`),
+  getUnreadCount: () => api.get('/messages/unread-count'),
 };
 
 // Notifications API
 export const notificationAPI = {
-  getAll: () => api.get('/notifications'),
+  getAll: (cursor) => api.get('/notifications', { params: { cursor } }),
   markAsRead: (notificationId) => api.post(`/notifications/${notificationId}/read`),
+  markRead: (ids) => api.post('/notifications/read', { ids }),
+  markAllRead: (before) => api.post('/notifications/read', { before }),
+  getUnreadCount: () => api.get('/notifications/unread-count'),
+};
+
+// Realtime events (server-sent events). EventSource cannot send headers, so a short-lived
+// stream token from /events/token goes in the query string instead of the access token.
+export const subscribeEvents = (onEvent) => {
+  let source = null;
+  let retryTimer = null;
+  let closed = false;
+
+  const connect = async () => {
+    try {
+      const response = await api.post('/events/token');
+      if (closed) return;
+      source = new EventSource(`${API}/events?token=${encodeURIComponent(response.data.token)}`);
+      ['message', 'read', 'notification'].forEach((type) => {
+        source.addEventListener(type, (e) => onEvent(JSON.parse(e.data)));
+      });
+      // The stream token expires quickly, so reconnect with a fresh one instead of EventSource's own retry
+      source.onerror = () => {
+        source.close();
+        if (!closed) retryTimer = setTimeout(connect, 5000);
+      };
+    } catch (error) {
+      if (!closed) retryTimer = setTimeout(connect, 5000);
+    }
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    if (source) source.close();
+  };
 };
 
 // Share API
 export const shareAPI = {
   sharePost: (postId, userIds) => api.post(`/posts/${postId}/share`, { userIds }),
+  getStatus: (jobId) => api.get(`/shares/${jobId}`),
 };
 
 export default api;
\ No newline at end of file
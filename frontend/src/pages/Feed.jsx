@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Heart, MessageCircle, Send, Bookmark, MoreHorizontal, Home, Search, PlusSquare, User, X, Trash2, ChevronLeft, ChevronRight, Eye, Share2 } from 'lucide-react';
 import { Avatar, AvatarFallback, AvatarImage } from '../components/ui/avatar';
 import { Button } from '../components/ui/button';
@@ -8,7 +8,7 @@ import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogTrigger } from
 import { DropdownMenu, DropdownMenuContent, DropdownMenuItem, DropdownMenuTrigger } from '../components/ui/dropdown-menu';
 import { toast } from '../hooks/use-toast';
 import { useNavigate } from 'react-router-dom';
-import { postAPI, storyAPI, userAPI, shareAPI } from '../api';
+import { postAPI, storyAPI, userAPI, shareAPI, notificationAPI, messageAPI, subscribeEvents } from '../api';
 
 const Feed = () => {
   const [posts, setPosts] = useState([]);
@@ -25,10 +25,16 @@ const Feed = () => {
   const [viewingStory, setViewingStory] = useState(null);
   const [currentStoryIndex, setCurrentStoryIndex] = useState(0);
   const [storyViews, setStoryViews] = useState([]);
+  const [storyViewsCount, setStoryViewsCount] = useState(0);
+  const [storyViewsCursor, setStoryViewsCursor] = useState(null);
+  const [storyViewsStoryId, setStoryViewsStoryId] = useState(null);
+  const pendingStoryViews = useRef(new Set());
   const [showStoryViews, setShowStoryViews] = useState(false);
   const [sharePostOpen, setSharePostOpen] = useState(false);
   const [sharePostId, setSharePostId] = useState(null);
   const [shareUsers, setShareUsers] = useState([]);
+  const [unreadNotifications, setUnreadNotifications] = useState(0);
+  const [unreadMessages, setUnreadMessages] = useState(0);
   const navigate = useNavigate();
 
   const currentUser = JSON.parse(localStorage.getItem('user') || '{}');
@@ -36,8 +42,35 @@ const Feed = () => {
   useEffect(() => {
     loadFeed();
     loadStories();
+    loadUnreadCounts();
+    return subscribeEvents((event) => {
+      if (event.type === 'notification') {
+        setUnreadNotifications((count) => count + 1);
+      } else if (event.type === 'message') {
+        setUnreadMessages((count) => count + 1);
+      }
+    });
   }, []);
 
+  const loadUnreadCounts = async () => {
+    try {
+      const [notifications, messages] = await Promise.all([
+        notificationAPI.getUnreadCount(),
+        messageAPI.getUnreadCount()
+      ]);
+      setUnreadNotifications(notifications.data.count);
+      setUnreadMessages(messages.data.count);
+    } catch (error) {
+      console.error('Error loading unread counts:', error);
+    }
+  };
+
+  const renderBadge = (count) => count > 0 && (
+    <span className="absolute -top-1 -right-2 min-w-[18px] h-[18px] px-1 rounded-full bg-red-500 text-white text-[10px] font-semibold flex items-center justify-center">
+      {count > 99 ? '99+' : count}
+    </span>
+  );
+
   const loadFeed = async () => {
     try {
       const response = await postAPI.getFeed();
@@ -85,6 +118,27 @@ const Feed = () => {
     }
   };
 
+  const handleLoadComments = async (post) => {
+    try {
+      const response = await postAPI.getComments(post.id, post.commentsCursor);
+      // Pages come newest first; show them oldest first above what is already loaded
+      const older = [...response.data.comments].reverse();
+
+      setPosts(prevPosts => prevPosts.map(p => {
+        if (p.id !== post.id) return p;
+        const loadedIds = new Set(p.comments.map(c => c.id));
+        return {
+          ...p,
+          comments: [...older.filter(c => !loadedIds.has(c.id)), ...p.comments],
+          commentsCursor: response.data.nextCursor,
+          allCommentsLoaded: !response.data.nextCursor
+        };
+      }));
+    } catch (error) {
+      console.error('Error loading comments:', error);
+    }
+  };
+
   const handleComment = async (postId) => {
     if (!commentText[postId] || !commentText[postId].trim()) return;
 
@@ -95,7 +149,8 @@ const Feed = () => {
         if (post.id === postId) {
           return {
             ...post,
-            comments: [...post.comments, response.data]
+            comments: [...post.comments, response.data],
+            commentCount: (post.commentCount || 0) + 1
           };
         }
         return post;
@@ -211,24 +266,45 @@ const Feed = () => {
     }
   };
 
-  const handleViewStory = async (storyGroup) => {
+  const handleViewStory = (storyGroup) => {
+    // Resume at the first story not seen yet
+    const firstUnseen = storyGroup.stories.findIndex((story) => !story.seen);
     setViewingStory(storyGroup);
-    setCurrentStoryIndex(0);
-    
-    // Record view
-    if (storyGroup.stories[0]) {
-      try {
-        await storyAPI.view(storyGroup.stories[0].id);
-      } catch (error) {
-        console.error('Error recording view:', error);
-      }
+    setCurrentStoryIndex(firstUnseen === -1 ? 0 : firstUnseen);
+  };
+
+  // Collect unseen stories as they are shown; they are recorded in one request when the viewer closes
+  useEffect(() => {
+    const story = viewingStory?.stories[currentStoryIndex];
+    if (story && !story.seen) {
+      pendingStoryViews.current.add(story.id);
+    }
+  }, [viewingStory, currentStoryIndex]);
+
+  const closeStoryViewer = async () => {
+    setViewingStory(null);
+    const storyIds = [...pendingStoryViews.current];
+    pendingStoryViews.current.clear();
+    if (storyIds.length === 0) return;
+
+    try {
+      await storyAPI.viewMany(storyIds);
+      setStories((prev) => prev.map((group) => {
+        const groupStories = group.stories.map((s) => (storyIds.includes(s.id) ? { ...s, seen: true } : s));
+        return { ...group, stories: groupStories, allSeen: groupStories.every((s) => s.seen) };
+      }));
+    } catch (error) {
+      console.error('Error recording views:', error);
     }
   };
 
-  const loadStoryViews = async (storyId) => {
+  const loadStoryViews = async (storyId, cursor) => {
     try {
-      const response = await storyAPI.getViews(storyId);
-      setStoryViews(response.data.views);
+      const response = await storyAPI.getViews(storyId, cursor);
+      setStoryViews(cursor ? [...storyViews, ...response.data.views] : response.data.views);
+      setStoryViewsCount(response.data.count);
+      setStoryViewsCursor(response.data.nextCursor);
+      setStoryViewsStoryId(storyId);
       setShowStoryViews(true);
     } catch (error) {
       toast({
@@ -242,9 +318,9 @@ const Feed = () => {
   const handleSharePost = async (postId) => {
     setSharePostId(postId);
     
-    // Load users to share with
+    // Load users to share with: the people the current user follows
     try {
-      const response = await userAPI.search('');
+      const response = await userAPI.getFollowing(currentUser.id);
       setShareUsers(response.data.users);
       setSharePostOpen(true);
     } catch (error) {
@@ -258,11 +334,13 @@ const Feed = () => {
 
   const handleSendShare = async (userIds) => {
     try {
-      await shareAPI.sharePost(sharePostId, userIds);
+      const response = await shareAPI.sharePost(sharePostId, userIds);
       setSharePostOpen(false);
       toast({
         title: 'Compartilhado!',
-        description: `Post compartilhado com ${userIds.length} pessoas`
+        description: response.status === 202
+          ? `Enviando para ${response.data.total} pessoas`
+          : `Post compartilhado com ${response.data.sentCount} pessoas`
       });
     } catch (error) {
       toast({
@@ -304,14 +382,20 @@ const Feed = () => {
             InstaClone
           </h1>
           <div className="flex gap-4">
-            <Heart 
-              className="w-6 h-6 cursor-pointer hover:text-pink-600 transition-colors" 
-              onClick={() => navigate('/notifications')}
-            />
-            <Send 
-              className="w-6 h-6 cursor-pointer hover:text-blue-600 transition-colors" 
-              onClick={() => navigate('/messages')}
-            />
+            <div className="relative">
+              <Heart 
+                className="w-6 h-6 cursor-pointer hover:text-pink-600 transition-colors" 
+                onClick={() => navigate('/notifications')}
+              />
+              {renderBadge(unreadNotifications)}
+            </div>
+            <div className="relative">
+              <Send 
+                className="w-6 h-6 cursor-pointer hover:text-blue-600 transition-colors" 
+                onClick={() => navigate('/messages')}
+              />
+              {renderBadge(unreadMessages)}
+            </div>
           </div>
         </div>
       </div>
@@ -468,7 +552,9 @@ const Feed = () => {
                     className="flex flex-col items-center gap-1 cursor-pointer flex-shrink-0"
                     onClick={() => handleViewStory(storyGroup)}
                   >
-                    <div className="w-16 h-16 rounded-full bg-gradient-to-tr from-purple-600 via-pink-600 to-orange-600 p-0.5">
+                    <div className={`w-16 h-16 rounded-full p-0.5 ${
+                      storyGroup.allSeen ? 'bg-gray-300' : 'bg-gradient-to-tr from-purple-600 via-pink-600 to-orange-600'
+                    }`}>
                       <div className="bg-white rounded-full p-0.5 w-full h-full">
                         <Avatar className="w-full h-full">
                           <AvatarImage src={storyGroup.profilePicture} />
@@ -596,6 +682,15 @@ const Feed = () => {
                         {post.caption}
                       </p>
 
+                      {!post.allCommentsLoaded && post.commentCount > post.comments.length && (
+                        <button
+                          onClick={() => handleLoadComments(post)}
+                          className="text-sm text-gray-500"
+                        >
+                          Ver todos os {post.commentCount} comentários
+                        </button>
+                      )}
+
                       {post.comments.length > 0 && (
                         <div className="space-y-1">
                           {post.comments.map((comment) => (
@@ -663,7 +758,7 @@ const Feed = () => {
 
       {/* Story Viewer Modal */}
       {viewingStory && (
-        <Dialog open={!!viewingStory} onOpenChange={() => setViewingStory(null)}>
+        <Dialog open={!!viewingStory} onOpenChange={closeStoryViewer}>
           <DialogContent className="max-w-md p-0 bg-black border-0">
             <div className="relative aspect-[9/16] bg-black">
               {viewingStory.stories[currentStoryIndex]?.imageUrl.includes('.mp4') || 
@@ -708,7 +803,7 @@ const Feed = () => {
                       </button>
                     )}
                     <button
-                      onClick={() => setViewingStory(null)}
+                      onClick={closeStoryViewer}
                       className="text-white hover:text-gray-300"
                     >
                       <X className="w-6 h-6" />
@@ -763,7 +858,7 @@ const Feed = () => {
       <Dialog open={showStoryViews} onOpenChange={setShowStoryViews}>
         <DialogContent>
           <DialogHeader>
-            <DialogTitle>Visualizações</DialogTitle>
+            <DialogTitle>Visualizações ({storyViewsCount})</DialogTitle>
           </DialogHeader>
           <div className="max-h-96 overflow-y-auto">
             {storyViews.length > 0 ? (
@@ -780,6 +875,15 @@ const Feed = () => {
                     </div>
                   </div>
                 ))}
+                {storyViewsCursor && (
+                  <Button
+                    variant="ghost"
+                    className="w-full text-sm text-gray-500"
+                    onClick={() => loadStoryViews(storyViewsStoryId, storyViewsCursor)}
+                  >
+                    Carregar mais
+                  </Button>
+                )}
               </div>
             ) : (
               <p className="text-center py-8 text-gray-500">Nenhuma visualização ainda</p>
@@ -12,6 +12,9 @@ const Followers = () => {
   const navigate = useNavigate();
   const [followers, setFollowers] = useState([]);
   const [following, setFollowing] = useState([]);
+  const [followersCursor, setFollowersCursor] = useState(null);
+  const [followingCursor, setFollowingCursor] = useState(null);
+  const [counts, setCounts] = useState({ followers: 0, following: 0 });
   const [loading, setLoading] = useState(true);
   const currentUser = JSON.parse(localStorage.getItem('user') || '{}');
 
@@ -21,16 +24,19 @@ const Followers = () => {
 
   const loadFollowers = async () => {
     try {
-      // Buscar todos os usuários e filtrar
-      const response = await userAPI.search('');
-      const allUsers = response.data.users;
-      
-      // Simular seguidores/seguindo baseado no isFollowing
-      setFollowing(allUsers.filter(u => u.isFollowing));
-      
-      // Para seguidores, seria necessário uma API específica
-      // Por ora, vamos deixar vazio
-      setFollowers([]);
+      const [profileRes, followersRes, followingRes] = await Promise.all([
+        userAPI.getProfile(currentUser.id),
+        userAPI.getFollowers(currentUser.id),
+        userAPI.getFollowing(currentUser.id)
+      ]);
+      setCounts({
+        followers: profileRes.data.user.followers,
+        following: profileRes.data.user.following
+      });
+      setFollowers(followersRes.data.users);
+      setFollowersCursor(followersRes.data.nextCursor);
+      setFollowing(followingRes.data.users);
+      setFollowingCursor(followingRes.data.nextCursor);
     } catch (error) {
       console.error('Error loading followers:', error);
     } finally {
@@ -38,10 +44,31 @@ const Followers = () => {
     }
   };
 
+  const loadMoreFollowers = async () => {
+    try {
+      const response = await userAPI.getFollowers(currentUser.id, followersCursor);
+      setFollowers(prev => [...prev, ...response.data.users]);
+      setFollowersCursor(response.data.nextCursor);
+    } catch (error) {
+      console.error('Error loading followers:', error);
+    }
+  };
+
+  const loadMoreFollowing = async () => {
+    try {
+      const response = await userAPI.getFollowing(currentUser.id, followingCursor);
+      setFollowing(prev => [...prev, ...response.data.users]);
+      setFollowingCursor(response.data.nextCursor);
+    } catch (error) {
+      console.error('Error loading following:', error);
+    }
+  };
+
   const handleUnfollow = async (userId) => {
     try {
       await userAPI.unfollow(userId);
       setFollowing(prev => prev.filter(u => u.id !== userId));
+      setCounts(prev => ({ ...prev, following: Math.max(0, prev.following - 1) }));
       toast({
         title: 'Deixou de seguir',
         description: 'Você não segue mais este usuário.'
@@ -80,10 +107,10 @@ const Followers = () => {
           <Tabs defaultValue="following" className="w-full">
             <TabsList className="w-full grid grid-cols-2">
               <TabsTrigger value="followers">
-                {followers.length} Seguidores
+                {counts.followers} Seguidores
               </TabsTrigger>
               <TabsTrigger value="following">
-                {following.length} Seguindo
+                {counts.following} Seguindo
               </TabsTrigger>
             </TabsList>
 
@@ -116,6 +143,11 @@ const Followers = () => {
                   </div>
                 )}
               </Card>
+              {followersCursor && (
+                <Button variant="outline" className="w-full mt-4" onClick={loadMoreFollowers}>
+                  Carregar mais
+                </Button>
+              )}
             </TabsContent>
 
             <TabsContent value="following" className="mt-4">
@@ -155,6 +187,11 @@ const Followers = () => {
                   </div>
                 )}
               </Card>
+              {followingCursor && (
+                <Button variant="outline" className="w-full mt-4" onClick={loadMoreFollowing}>
+                  Carregar mais
+                </Button>
+              )}
             </TabsContent>
           </Tabs>
         </div>
@@ -6,14 +6,16 @@ import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
 import { Card } from '../components/ui/card';
 import { toast } from '../hooks/use-toast';
-import { messageAPI } from '../api';
+import { messageAPI, subscribeEvents } from '../api';
 
 const Messages = () => {
   const navigate = useNavigate();
   const { userId } = useParams();
   const [conversations, setConversations] = useState([]);
+  const [conversationsCursor, setConversationsCursor] = useState(null);
   const [selectedConversation, setSelectedConversation] = useState(null);
   const [messages, setMessages] = useState([]);
+  const [messagesCursor, setMessagesCursor] = useState(null);
   const [newMessage, setNewMessage] = useState('');
   const [loading, setLoading] = useState(true);
   const currentUser = JSON.parse(localStorage.getItem('user') || '{}');
@@ -25,10 +27,25 @@ const Messages = () => {
     }
   }, [userId]);
 
+  useEffect(() => {
+    return subscribeEvents((event) => {
+      if (event.type === 'message') {
+        if (event.message.senderId === userId) {
+          setMessages((prev) => [...prev, event.message]);
+          messageAPI.markAsRead(userId);
+        }
+        loadConversations();
+      } else if (event.type === 'read' && event.userId === userId) {
+        setMessages((prev) => prev.map((m) => (m.senderId === currentUser.id ? { ...m, read: true } : m)));
+      }
+    });
+  }, [userId]);
+
   const loadConversations = async () => {
     try {
       const response = await messageAPI.getConversations();
       setConversations(response.data.conversations);
+      setConversationsCursor(response.data.nextCursor);
     } catch (error) {
       console.error('Error loading conversations:', error);
     } finally {
@@ -36,10 +53,24 @@ const Messages = () => {
     }
   };
 
+  const loadMoreConversations = async () => {
+    try {
+      const response = await messageAPI.getConversations(conversationsCursor);
+      setConversations(prev => [...prev, ...response.data.conversations]);
+      setConversationsCursor(response.data.nextCursor);
+    } catch (error) {
+      console.error('Error loading conversations:', error);
+    }
+  };
+
   const loadMessages = async (otherUserId) => {
     try {
       const response = await messageAPI.getMessages(otherUserId);
       setMessages(response.data.messages);
+      setMessagesCursor(response.data.nextCursor);
+      if (response.data.messages.some(m => m.senderId === otherUserId && !m.read)) {
+        messageAPI.markAsRead(otherUserId);
+      }
       
       // Find conversation
       const conv = conversations.find(c => c.userId === otherUserId);
@@ -49,6 +80,16 @@ const Messages = () => {
     }
   };
 
+  const loadOlderMessages = async () => {
+    try {
+      const response = await messageAPI.getMessages(userId, messagesCursor);
+      setMessages(prev => [...response.data.messages, ...prev]);
+      setMessagesCursor(response.data.nextCursor);
+    } catch (error) {
+      console.error('Error loading messages:', error);
+    }
+  };
+
   const handleSendMessage = async (e) => {
     e.preventDefault();
     if (!newMessage.trim() || !userId) return;
@@ -118,6 +159,13 @@ const Messages = () => {
           className="flex-1 overflow-y-auto pt-16 pb-20 px-4"
         >
           <div className="max-w-2xl mx-auto space-y-4 py-4">
+            {messagesCursor && (
+              <div className="text-center">
+                <Button variant="ghost" size="sm" onClick={loadOlderMessages}>
+                  Carregar mensagens anteriores
+                </Button>
+              </div>
+            )}
             {messages.map((msg) => (
               <div
                 key={msg.id}
@@ -210,6 +258,11 @@ const Messages = () => {
               </div>
             )}
           </Card>
+          {conversationsCursor && (
+            <Button variant="outline" className="w-full mt-4" onClick={loadMoreConversations}>
+              Carregar mais
+            </Button>
+          )}
         </div>
       </div>
     </div>
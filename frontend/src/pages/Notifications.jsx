@@ -3,7 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import { ArrowLeft, Heart, MessageCircle, UserPlus } from 'lucide-react';
 import { Avatar, AvatarFallback, AvatarImage } from '../components/ui/avatar';
 import { Card } from '../components/ui/card';
-import { notificationAPI } from '../api';
+import { notificationAPI, subscribeEvents } from '../api';
 
 const Notifications = () => {
   const navigate = useNavigate();
@@ -12,12 +12,23 @@ const Notifications = () => {
 
   useEffect(() => {
     loadNotifications();
+    return subscribeEvents((event) => {
+      if (event.type === 'notification') {
+        loadNotifications();
+      }
+    });
   }, []);
 
   const loadNotifications = async () => {
     try {
       const response = await notificationAPI.getAll();
       setNotifications(response.data.notifications);
+      // Opening the page marks everything shown as read in one request; highlights stay until reload
+      if (response.data.readCursor && response.data.notifications.some(n => !n.read)) {
+        notificationAPI.markAllRead(response.data.readCursor).catch((error) => {
+          console.error('Error marking notifications as read:', error);
+        });
+      }
     } catch (error) {
       console.error('Error loading notifications:', error);
     } finally {
@@ -25,21 +36,7 @@ const Notifications = () => {
     }
   };
 
-  const handleNotificationClick = async (notification) => {
-    // Mark as read
-    if (!notification.read) {
-      try {
-        await notificationAPI.markAsRead(notification.id);
-        setNotifications(prevNotifs => 
-          prevNotifs.map(n => 
-            n.id === notification.id ? { ...n, read: true } : n
-          )
-        );
-      } catch (error) {
-        console.error('Error marking notification as read:', error);
-      }
-    }
-
+  const handleNotificationClick = (notification) => {
     // Navigate based on type
     if (notification.type === 'follow') {
       navigate(`/user/${notification.actorId}`);
@@ -117,6 +114,14 @@ const Notifications = () => {
                   <div className="flex-1">
                     <p className="text-sm">
                       <span className="font-semibold">{notification.actorUsername}</span>{' '}
+                      {notification.othersCount > 0 && (
+                        <>
+                          e mais{' '}
+                          <span className="font-semibold">
+                            {notification.othersCount} {notification.othersCount === 1 ? 'pessoa' : 'pessoas'}
+                          </span>{' '}
+                        </>
+                      )}
                       {notification.message}
                     </p>
                     <p className="text-xs text-gray-500 mt-1">{formatTimestamp(notification.timestamp)}</p>
@@ -9,12 +9,13 @@ import { Input } from '../components/ui/input';
 import { Textarea } from '../components/ui/textarea';
 import { Label } from '../components/ui/label';
 import { toast } from '../hooks/use-toast';
-import { authAPI, userAPI, postAPI } from '../api';
+import { authAPI, userAPI } from '../api';
 
 const Profile = () => {
   const navigate = useNavigate();
   const [user, setUser] = useState(null);
   const [userPosts, setUserPosts] = useState([]);
+  const [postsCursor, setPostsCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [editOpen, setEditOpen] = useState(false);
   const [editData, setEditData] = useState({
@@ -39,9 +40,7 @@ const Profile = () => {
       });
       
       // Load user posts
-      const feedResponse = await postAPI.getFeed();
-      const myPosts = feedResponse.data.posts.filter(p => p.userId === response.data.user.id);
-      setUserPosts(myPosts);
+      await loadPosts(response.data.user.id);
     } catch (error) {
       console.error('Error loading profile:', error);
       toast({
@@ -54,6 +53,12 @@ const Profile = () => {
     }
   };
 
+  const loadPosts = async (userId, cursor) => {
+    const response = await userAPI.getPosts(userId, cursor);
+    setUserPosts((prev) => (cursor ? [...prev, ...response.data.posts] : response.data.posts));
+    setPostsCursor(response.data.nextCursor);
+  };
+
   const handleLogout = () => {
     localStorage.clear();
     navigate('/login');
@@ -263,7 +268,7 @@ const Profile = () => {
                       className="relative aspect-square bg-gray-100 cursor-pointer group overflow-hidden rounded-sm"
                     >
                       <img
-                        src={post.imageUrl}
+                        src={post.thumbnailUrl}
                         alt="Post"
                         className="w-full h-full object-cover"
                       />
@@ -275,7 +280,7 @@ const Profile = () => {
                           </div>
                           <div className="flex items-center gap-2">
                             <MessageCircle className="w-6 h-6 fill-white" />
-                            <span className="font-semibold">{post.comments?.length || 0}</span>
+                            <span className="font-semibold">{post.commentCount}</span>
                           </div>
                         </div>
                       </div>
@@ -291,6 +296,13 @@ const Profile = () => {
                   </Button>
                 </div>
               )}
+              {postsCursor && (
+                <div className="text-center mt-6">
+                  <Button variant="outline" onClick={() => loadPosts(user.id, postsCursor)}>
+                    Carregar mais
+                  </Button>
+                </div>
+              )}
             </TabsContent>
           </Tabs>
         </div>
@@ -1,17 +1,18 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import { Grid, Heart, ArrowLeft, UserPlus, UserCheck } from 'lucide-react';
+import { Grid, Heart, ArrowLeft, UserPlus, UserCheck, MessageCircle } from 'lucide-react';
 import { Avatar, AvatarFallback, AvatarImage } from '../components/ui/avatar';
 import { Button } from '../components/ui/button';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '../components/ui/tabs';
 import { toast } from '../hooks/use-toast';
-import { userAPI, postAPI } from '../api';
+import { userAPI } from '../api';
 
 const UserProfile = () => {
   const { userId } = useParams();
   const navigate = useNavigate();
   const [user, setUser] = useState(null);
   const [userPosts, setUserPosts] = useState([]);
+  const [postsCursor, setPostsCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [following, setFollowing] = useState(false);
 
@@ -21,36 +22,12 @@ const UserProfile = () => {
 
   const loadUserProfile = async () => {
     try {
-      // Get all posts and filter by userId
-      const feedResponse = await postAPI.getFeed();
-      const posts = feedResponse.data.posts.filter(p => p.userId === userId);
-      setUserPosts(posts);
-      
-      // Get user info from posts or search
-      if (posts.length > 0) {
-        const post = posts[0];
-        setUser({
-          id: userId,
-          username: post.username,
-          fullName: post.username,
-          profilePicture: post.userProfilePicture,
-          bio: '',
-          posts: posts.length,
-          followers: 0,
-          following: 0
-        });
-      } else {
-        // Try to search for user
-        const searchResponse = await userAPI.search('');
-        const foundUser = searchResponse.data.users.find(u => u.id === userId);
-        if (foundUser) {
-          setUser({
-            ...foundUser,
-            posts: 0
-          });
-          setFollowing(foundUser.isFollowing);
-        }
-      }
+      const profileResponse = await userAPI.getProfile(userId);
+      setUser(profileResponse.data.user);
+      setFollowing(profileResponse.data.user.isFollowing);
+
+      // The route param may be a username; posts are keyed by id
+      await loadPosts(profileResponse.data.user.id);
     } catch (error) {
       console.error('Error loading profile:', error);
       toast({
@@ -63,6 +40,12 @@ const UserProfile = () => {
     }
   };
 
+  const loadPosts = async (profileUserId, cursor) => {
+    const response = await userAPI.getPosts(profileUserId, cursor);
+    setUserPosts((prev) => (cursor ? [...prev, ...response.data.posts] : response.data.posts));
+    setPostsCursor(response.data.nextCursor);
+  };
+
   const handleFollow = async () => {
     try {
       if (following) {
@@ -211,7 +194,7 @@ const UserProfile = () => {
                       className="relative aspect-square bg-gray-100 cursor-pointer group overflow-hidden rounded-sm"
                     >
                       <img
-                        src={post.imageUrl}
+                        src={post.thumbnailUrl}
                         alt="Post"
                         className="w-full h-full object-cover"
                       />
@@ -221,6 +204,10 @@ const UserProfile = () => {
                             <Heart className="w-6 h-6 fill-white" />
                             <span className="font-semibold">{post.likes}</span>
                           </div>
+                          <div className="flex items-center gap-2">
+                            <MessageCircle className="w-6 h-6 fill-white" />
+                            <span className="font-semibold">{post.commentCount}</span>
+                          </div>
                         </div>
                       </div>
                     </div>
@@ -232,6 +219,13 @@ const UserProfile = () => {
                   <p className="text-gray-600 text-lg">Nenhuma publicação ainda</p>
                 </div>
               )}
+              {postsCursor && (
+                <div className="text-center mt-6">
+                  <Button variant="outline" onClick={() => loadPosts(user.id, postsCursor)}>
+                    Carregar mais
+                  </Button>
+                </div>
+              )}
             </TabsContent>
           </Tabs>
         </div>
@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from events import InProcessEventBus
+from notifications import NotificationBatcher
+
+async def _like_bursts(bursts):
+    db = mongomock_motor.AsyncMongoMockClient()["notifications_test"]
+    owner = await db.users.insert_one({"username": "owner", "unreadNotifications": 0})
+    owner_id = str(owner.inserted_id)
+    batcher = NotificationBatcher(db.notifications, db.users, InProcessEventBus())
+    for burst in bursts:
+        for actor_id in burst:
+            batcher.emit(owner_id, actor_id, "like", "curtiu sua foto", post_id="post", post_image="image")
+        await batcher.flush()
+    notifications = await db.notifications.find({}, {"actorIds": 1, "actorCount": 1}).to_list(None)
+    user = await db.users.find_one({"_id": owner.inserted_id})
+    return notifications, user["unreadNotifications"]
+
+def test_repeat_like_does_not_count_actor_twice():
+    first, second = str(ObjectId()), str(ObjectId())
+    # Like, unlike and like again, then a second user in the same window
+    notifications, unread = asyncio.run(_like_bursts([[first], [first], [second, first], [second]]))
+    assert len(notifications) == 1
+    assert notifications[0]["actorIds"] == [second, first]
+    assert notifications[0]["actorCount"] == 2
+    assert unread == 1
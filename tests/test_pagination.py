@@ -0,0 +1,31 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from pagination import decode_cursor, encode_cursor
+
+def _raw_cursor(key: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+def test_cursor_round_trip():
+    timestamp, object_id = datetime(2026, 1, 1, 12, 30), ObjectId()
+    assert decode_cursor(encode_cursor(timestamp, object_id)) == (timestamp, object_id)
+    assert decode_cursor(encode_cursor(42, object_id), int) == (42, object_id)
+    assert decode_cursor(encode_cursor(timestamp, "a_b"), id_type=str) == (timestamp, "a_b")
+
+@pytest.mark.parametrize("key, value_type, id_type", [
+    ({"v": "x", "id": str(ObjectId())}, datetime, ObjectId),
+    ({"t": "2026-01-01T00:00:00+00:00", "id": str(ObjectId())}, datetime, ObjectId),
+    ({"t": "2026-01-01T00:00:00", "sid": "a_b"}, datetime, ObjectId),
+    ({"v": True, "id": str(ObjectId())}, int, ObjectId),
+    ({"v": "10", "id": str(ObjectId())}, int, ObjectId),
+    ({"t": "2026-01-01T00:00:00", "sid": 5}, datetime, str),
+])
+def test_cursor_of_the_wrong_type_is_rejected(key, value_type, id_type):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(_raw_cursor(key), value_type, id_type)
+    assert error.value.status_code == 400
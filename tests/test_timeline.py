@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+import timeline
+from pagination import NEWEST_FIRST, next_cursor, with_cursor
+from timeline import CELEBRITY_FOLLOWER_THRESHOLD, TimelineEngine
+
+PAGE_SIZE = 5
+
+async def _read_all_pages(engine, posts, user_id, author_ids):
+    """Page through the feed the way get_feed does, falling back to the posts query"""
+    seen = []
+    cursor = None
+    while True:
+        page = await engine.read(user_id, cursor, 0, PAGE_SIZE)
+        if page is None:
+            page = await posts.find(
+                with_cursor({"userId": {"$in": author_ids}}, cursor), {"userId": 1, "timestamp": 1}
+            ).sort(NEWEST_FIRST).limit(PAGE_SIZE).to_list(PAGE_SIZE)
+        seen.extend(post["_id"] for post in page)
+        cursor = next_cursor(page, PAGE_SIZE)
+        if not cursor:
+            return seen
+
+async def _setup():
+    db = mongomock_motor.AsyncMongoMockClient()["timeline_test"]
+    engine = TimelineEngine(db.timelines, db.posts, db.users, db.follows)
+    viewer_id = str(ObjectId())
+    celebrity = await db.users.insert_one({"username": "celeb", "followersCount": CELEBRITY_FOLLOWER_THRESHOLD})
+    regular = await db.users.insert_one({"username": "regular", "followersCount": 1})
+    return db, engine, viewer_id, str(celebrity.inserted_id), str(regular.inserted_id)
+
+async def _post(db, engine, author_id, timestamp):
+    post = {"_id": ObjectId(), "userId": author_id, "timestamp": timestamp}
+    await db.posts.insert_one(post)
+    await engine.fan_out_post(post, await db.users.find_one({"_id": ObjectId(author_id)}))
+    return post["_id"]
+
+async def _celebrity_and_regular_feed():
+    db, engine, viewer_id, celebrity_id, regular_id = await _setup()
+    for followee_id in (celebrity_id, regular_id):
+        await db.follows.insert_one({"followerId": viewer_id, "followeeId": followee_id})
+    # Materialize the (empty) timeline before anything is posted
+    assert await engine.read(viewer_id, None, 0, PAGE_SIZE) == []
+
+    # Celebrity and regular posts alternate; only the regular ones are fanned out to the viewer
+    start = datetime(2026, 1, 1)
+    expected = []
+    for i in range(15):
+        for offset, author_id in ((0, regular_id), (1, celebrity_id)):
+            expected.append(await _post(db, engine, author_id, start + timedelta(minutes=2 * i + offset)))
+
+    seen = await _read_all_pages(engine, db.posts, viewer_id, [celebrity_id, regular_id, viewer_id])
+    return seen, list(reversed(expected))
+
+async def _follow_and_unfollow_celebrity():
+    db, engine, viewer_id, celebrity_id, regular_id = await _setup()
+    await db.follows.insert_one({"followerId": viewer_id, "followeeId": regular_id})
+    start = datetime(2026, 1, 1)
+    regular_post = await _post(db, engine, regular_id, start)
+    celebrity_post = await _post(db, engine, celebrity_id, start + timedelta(minutes=1))
+    before = await engine.read(viewer_id, None, 0, PAGE_SIZE)
+
+    await db.follows.insert_one({"followerId": viewer_id, "followeeId": celebrity_id})
+    await engine.add_followee(viewer_id, celebrity_id)
+    following = await engine.read(viewer_id, None, 0, PAGE_SIZE)
+
+    await db.follows.delete_one({"followerId": viewer_id, "followeeId": celebrity_id})
+    await engine.remove_followee(viewer_id, celebrity_id)
+    after = await engine.read(viewer_id, None, 0, PAGE_SIZE)
+    return [[post["_id"] for post in page] for page in (before, following, after)], regular_post, celebrity_post
+
+def test_truncated_timeline_keeps_older_regular_posts(monkeypatch):
+    monkeypatch.setattr(timeline, "TIMELINE_SIZE", 5)
+    seen, expected = asyncio.run(_celebrity_and_regular_feed())
+    assert seen == expected
+
+def test_celebrity_followees_are_tracked_on_the_timeline():
+    (before, following, after), regular_post, celebrity_post = asyncio.run(_follow_and_unfollow_celebrity())
+    assert before == [regular_post]
+    assert following == [celebrity_post, regular_post]
+    assert after == [regular_post]